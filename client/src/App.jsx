@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import axios from 'axios';
 import './App.css';
 import ProductCard from './components/ProductCard';
@@ -12,11 +12,39 @@ import { AnimatePresence } from 'framer-motion';
 // Configure axios base URL
 axios.defaults.baseURL = 'http://localhost:8000';
 
+// GET /search/stream, calling onEvent for each NDJSON line as it arrives
+// (axios buffers the whole body in the browser, so this uses fetch);
+// aborting `signal` cancels the request and the read loop
+async function streamSearch(params, onEvent, signal) {
+  const url = `${axios.defaults.baseURL}/search/stream?${new URLSearchParams(params)}`;
+  const response = await fetch(url, { signal });
+  if (!response.ok || !response.body) {
+    throw new Error(`Search failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+  }
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
+
 function App() {
   const [query, setQuery] = useState('');
   const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(false);
+  // First results are on screen, rerank / explanations still arriving
+  const [refining, setRefining] = useState(false);
   const [error, setError] = useState(null);
+  // In-flight search; a new search aborts it so stale events can't land
+  const searchController = useRef(null);
 
   // Dashboard state
   const [showDashboard, setShowDashboard] = useState(false);
@@ -38,28 +66,74 @@ function App() {
     e.preventDefault();
     if (!query.trim()) return;
 
+    searchController.current?.abort();
+    const controller = new AbortController();
+    searchController.current = controller;
+    const { signal } = controller;
+
     const startTime = performance.now();
     setLoading(true);
+    setRefining(false);
     setError(null);
     setResults(null);
     setSelectedForComparison([]);
 
-    try {
-      const params = { q: query };
-      if (selectedCategory) params.category = selectedCategory;
-      if (minSentiment !== null) params.min_sentiment = minSentiment;
-      if (sortBy) params.sort_by = sortBy;
+    const params = { q: query };
+    if (selectedCategory) params.category = selectedCategory;
+    if (minSentiment !== null) params.min_sentiment = minSentiment;
+    if (sortBy) params.sort_by = sortBy;
+
+    let received = false;
+    const handleEvent = (event) => {
+      if (signal.aborted) return;
+      if (event.stage === 'error') throw new Error(event.detail);
+      if (event.stage === 'explanation') {
+        // Patch one result in place once its fallback aspects are ready
+        setResults(prev => prev && {
+          ...prev,
+          results: prev.results.map((item, i) => (i === event.index ? event.result : item)),
+          raw_recs: prev.raw_recs.map((rec, i) => (i === event.index ? event.raw_rec : rec))
+        });
+      } else {
+        setResults(event.response);
+      }
+      if (!received) {
+        received = true;
+        setLoading(false);
+        const firstPaint = ((performance.now() - startTime) / 1000).toFixed(2);
+        console.log(`⚡ First results (${event.stage}) in ${firstPaint}s`);
+      }
+      setRefining(event.stage !== 'done');
+    };
 
-      const response = await axios.get(`/search`, { params });
-      setResults(response.data);
+    try {
+      await streamSearch(params, handleEvent, signal);
 
       const searchTime = ((performance.now() - startTime) / 1000).toFixed(2);
       console.log(`⚡ Search completed in ${searchTime}s`);
     } catch (err) {
+      // Superseded by a newer search, which owns the UI state now
+      if (signal.aborted) return;
       console.error(err);
-      setError('Failed to fetch recommendations. Ensure backend is running.');
+      if (!received) {
+        // Older servers without /search/stream: one blocking request
+        try {
+          const response = await axios.get(`/search`, { params, signal });
+          setResults(response.data);
+        } catch (fallbackErr) {
+          if (signal.aborted) return;
+          console.error(fallbackErr);
+          setError('Failed to fetch recommendations. Ensure backend is running.');
+        }
+      } else {
+        setError('Search was interrupted before all results were refined.');
+      }
     } finally {
-      setLoading(false);
+      if (searchController.current === controller) {
+        searchController.current = null;
+        setLoading(false);
+        setRefining(false);
+      }
     }
   };
 
@@ -167,6 +241,7 @@ function App() {
               <div className="overall-sentiment">
                 Overall Sentiment: <span className={results.overall_sentiment.label.toLowerCase()}>{results.overall_sentiment.label}</span>
               </div>
+              {refining && <div className="refining-note">Refining ranking and explanations...</div>}
             </div>
           </div>
         )}
@@ -0,0 +1,134 @@
+"""
+Parity and latency of the optimized ABSA backends against fp32 torch.
+
+    python scripts/absa_parity.py                       # int8 and onnx vs torch, 300 pairs
+    python scripts/absa_parity.py --backends int8 --pairs 1000 --min-agreement 0.97
+
+(text, aspect) pairs are sampled from the processed data (or the CSV) and
+aspect candidates come from the same spaCy extraction the server uses.
+For each backend it reports label agreement, confidence differences and
+per-pair latency / speed-up. It exits non-zero if a backend's label
+agreement is below --min-agreement or its mean confidence error above
+--max-confidence-diff, so it can gate switching ABSA_BACKEND.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "..", "server"))
+
+import torch  # noqa: E402
+from absa import ABSA_BACKENDS, load_spacy, load_absa_pipeline, extract_aspect_candidates  # noqa: E402
+from absa_cache import absa_input  # noqa: E402
+
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+MODEL_PATH = os.path.join(BASE_DIR, "..", "models", "deberta-v3-base-absa")
+
+
+def load_reviews(dataframe, count, seed):
+    base = os.path.join(DATA_DIR, dataframe)
+    for path, reader in ((base + "_processed.parquet", pd.read_parquet), (base + "_processed.pkl", pd.read_pickle), (base, pd.read_csv)):
+        if os.path.exists(path):
+            reviews = reader(path)["reviewText"].dropna().astype(str)
+            reviews = reviews[reviews.str.len() > 15].drop_duplicates()
+            return reviews.sample(min(count, len(reviews)), random_state=seed).tolist()
+    raise FileNotFoundError(f"No data found for {dataframe} in {DATA_DIR}")
+
+
+def run(absa_pipe, inputs, batch_size):
+    with torch.inference_mode():
+        absa_pipe(inputs[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        outputs = absa_pipe(inputs, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+    return outputs, elapsed
+
+
+def single_latency_ms(absa_pipe, inputs, n=50):
+    times = []
+    with torch.inference_mode():
+        for text in inputs[:n]:
+            start = time.perf_counter()
+            absa_pipe([text])
+            times.append(time.perf_counter() - start)
+    return float(np.percentile(times, 50) * 1000), float(np.percentile(times, 95) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataframe", default="Second_fixed_image_urls.csv")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"], choices=[b for b in ABSA_BACKENDS if b != "torch"])
+    parser.add_argument("--pairs", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--max-confidence-diff", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report here")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    nlp = load_spacy()
+    reviews = load_reviews(args.dataframe, args.pairs, args.seed)
+    pairs = [(r, a) for r, aspects in zip(reviews, extract_aspect_candidates(nlp, reviews)) for a in aspects][:args.pairs]
+    inputs = [absa_input(text, aspect) for text, aspect in pairs]
+    print(f"{len(inputs)} (review, aspect) pairs from {len(reviews)} reviews\n")
+
+    reference = load_absa_pipeline(args.model_path, "cpu", "torch")
+    ref_out, ref_time = run(reference, inputs, args.batch_size)
+    ref_p50, ref_p95 = single_latency_ms(reference, inputs)
+    report = {"pairs": len(inputs), "torch": {
+        "ms_per_pair": round(ref_time / len(inputs) * 1000, 3), "single_p50_ms": round(ref_p50, 2), "single_p95_ms": round(ref_p95, 2)
+    }}
+    ref_labels = np.array([o["label"] for o in ref_out])
+    ref_scores = np.array([o["score"] for o in ref_out])
+
+    failed = False
+    header = f"{'backend':<8} {'agreement':>9} {'mean |Δconf|':>12} {'max |Δconf|':>11} {'ms/pair':>8} {'speed-up':>8} {'p50 ms':>7} {'p95 ms':>7}"
+    print(header)
+    print("-" * len(header))
+    print(f"{'torch':<8} {1:>9.4f} {0:>12.4f} {0:>11.4f} {report['torch']['ms_per_pair']:>8.2f} {1:>8.2f} {ref_p50:>7.1f} {ref_p95:>7.1f}")
+    for backend in args.backends:
+        candidate = load_absa_pipeline(args.model_path, "cpu", backend)
+        if getattr(candidate, "absa_backend", backend) != backend:
+            print(f"{backend:<8} unavailable (fell back to torch), skipped")
+            report[backend] = {"available": False}
+            continue
+        out, elapsed = run(candidate, inputs, args.batch_size)
+        p50, p95 = single_latency_ms(candidate, inputs)
+        labels = np.array([o["label"] for o in out])
+        scores = np.array([o["score"] for o in out])
+        agreement = float((labels == ref_labels).mean())
+        same = labels == ref_labels
+        diff = np.abs(scores[same] - ref_scores[same]) if same.any() else np.zeros(1)
+        ms_per_pair = elapsed / len(inputs) * 1000
+        report[backend] = {
+            "available": True, "label_agreement": round(agreement, 4),
+            "mean_confidence_diff": round(float(diff.mean()), 5), "max_confidence_diff": round(float(diff.max()), 5),
+            # Pairs that would cross the 0.6 confidence cut the server applies
+            "threshold_flips": int(((scores > 0.6) != (ref_scores > 0.6)).sum()),
+            "ms_per_pair": round(ms_per_pair, 3), "speedup": round(ref_time / elapsed, 2),
+            "single_p50_ms": round(p50, 2), "single_p95_ms": round(p95, 2)
+        }
+        ok = agreement >= args.min_agreement and diff.mean() <= args.max_confidence_diff
+        failed |= not ok
+        print(f"{backend:<8} {agreement:>9.4f} {diff.mean():>12.4f} {diff.max():>11.4f} {ms_per_pair:>8.2f} "
+              f"{ref_time / elapsed:>8.2f} {p50:>7.1f} {p95:>7.1f}{'' if ok else '   FAIL'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Recall / speed / memory of the FAISS index types on the product embeddings.
+
+Compares every configuration against the exact Flat index:
+
+    python scripts/benchmark_ann.py                       # embeddings/enriched_item_descriptions_embeddings.npy
+    python scripts/benchmark_ann.py --k 30 --queries 2000 --json ann.json
+
+Queries are catalog vectors with a little Gaussian noise (so the product
+itself is not trivially the top hit), or SBERT encodings of the lines in
+--query-file if given. Pick the result with INDEX_TYPE / INDEX_NPROBE /
+INDEX_EF_SEARCH when starting the server.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "..", "server"))
+
+import faiss  # noqa: E402
+import ann_index  # noqa: E402
+
+DEFAULT_EMBEDDINGS = os.path.join(BASE_DIR, "..", "embeddings", "enriched_item_descriptions_embeddings.npy")
+
+# (index type, build params, search-time sweep)
+CONFIGS = [
+    ("flat", {}, [{}]),
+    ("ivf_flat", {}, [{"nprobe": p} for p in (1, 4, 16, 64)]),
+    ("ivf_pq", {}, [{"nprobe": p} for p in (4, 16, 64)]),
+    ("hnsw", {"hnsw_m": 32}, [{"ef_search": e} for e in (16, 64, 256)]),
+]
+
+
+def make_queries(embeddings, count, noise, query_file, seed=0):
+    if query_file:
+        from sentence_transformers import SentenceTransformer
+        with open(query_file) as f:
+            texts = [line.strip() for line in f if line.strip()]
+        model_path = os.path.join(BASE_DIR, "..", "models", "all-MiniLM-L6-v2")
+        model = SentenceTransformer(model_path if os.path.exists(model_path) else "all-MiniLM-L6-v2")
+        queries = model.encode(texts, convert_to_numpy=True).astype(np.float32)
+    else:
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(len(embeddings), min(count, len(embeddings)), replace=False)
+        queries = np.asarray(embeddings[np.sort(rows)], dtype=np.float32)
+        queries = queries + rng.normal(0, noise, queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def timed_search(index, queries, k):
+    # Batched throughput and single-query latency (what the server does)
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    batch_qps = len(queries) / (time.perf_counter() - start)
+    single = []
+    for q in queries[:min(200, len(queries))]:
+        start = time.perf_counter()
+        index.search(q.reshape(1, -1), k)
+        single.append(time.perf_counter() - start)
+    return ids, batch_qps, float(np.percentile(single, 50) * 1000), float(np.percentile(single, 99) * 1000)
+
+
+def recall_at_k(ids, truth):
+    hits = sum(len(set(a[a >= 0]) & set(b)) for a, b in zip(ids, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default=DEFAULT_EMBEDDINGS)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--query-file", default=None)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (server searches run one query each)")
+    parser.add_argument("--json", default=None, help="also write the results here")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    embeddings = np.load(args.embeddings, mmap_mode="r")
+    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+    queries = make_queries(vectors, args.queries, args.noise, args.query_file)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+
+    results, truth = [], None
+    header = f"{'index':<10} {'search params':<16} {'build s':>8} {'memory MB':>10} {'recall@k':>9} {'QPS':>9} {'p50 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for index_type, build_params, sweep in CONFIGS:
+        start = time.perf_counter()
+        try:
+            index = ann_index.build_index(vectors, index_type, build_params)
+        except Exception as e:
+            print(f"{index_type:<10} skipped: {e}")
+            continue
+        build_s = time.perf_counter() - start
+        memory_mb = ann_index.memory_bytes(index) / 2 ** 20
+        for search in sweep:
+            ann_index.configure_search(index, ann_index.resolve_params(index_type, {**build_params, **search}))
+            ids, qps, p50, p99 = timed_search(index, queries, args.k)
+            if truth is None:
+                truth = ids  # Flat runs first and is exact
+            row = {
+                "index_type": index_type, "build_params": build_params, "search_params": search,
+                "build_seconds": round(build_s, 3), "memory_mb": round(memory_mb, 2),
+                f"recall@{args.k}": round(recall_at_k(ids, truth), 4),
+                "qps": round(qps, 1), "p50_ms": round(p50, 3), "p99_ms": round(p99, 3)
+            }
+            results.append(row)
+            label = ",".join(f"{k}={v}" for k, v in search.items()) or "-"
+            print(f"{index_type:<10} {label:<16} {build_s:>8.2f} {memory_mb:>10.1f} "
+                  f"{row[f'recall@{args.k}']:>9.4f} {qps:>9.0f} {p50:>8.3f} {p99:>8.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"vectors": len(vectors), "dims": int(vectors.shape[1]), "k": args.k, "results": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Offline benchmark of the recommender on a synthetic catalog.
+
+    python scripts/benchmark_recommender.py                          # 1k / 10k / 50k products
+    python scripts/benchmark_recommender.py --sizes 1000 5000 --iterations 200 --json bench.json
+    python scripts/benchmark_recommender.py --baseline bench.json --tolerance 1.5   # CI gate
+
+Needs no data files, downloaded models, GPU or network: the catalog is
+generated (N products, --reviews-per-product, --aspect-density aspects per
+review) and SBERT, the cross-encoder, spaCy and the ABSA pipeline are
+replaced by cheap deterministic stand-ins, so what is measured is the
+recommender's own work (pandas, FAISS, caches, aspect stores, analytics,
+feedback persistence), not model inference. Each catalog size runs in a
+fresh process so peak RSS is per size.
+
+Reported per operation: p50 / p95 / p99 latency and throughput for
+``recommend`` (uncached, filtered, cached), ``add_feedback``,
+``get_analytics`` and ``compare_products``, plus start-up time and peak
+RSS. With --baseline it exits non-zero if any p95 (or start-up time)
+grew by more than --tolerance x against that earlier --json report.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "..", "server"))
+
+CATEGORIES = ["Electronics", "Books", "Toys", "Garden", "Kitchen", "Sports", "Beauty", "Automotive"]
+ASPECTS = [
+    "battery life", "screen", "price", "sound quality", "design", "durability", "size", "weight",
+    "customer service", "shipping", "instructions", "material", "color", "comfort", "performance",
+    "pages", "plot", "characters", "assembly", "packaging", "smell", "texture", "fit", "noise"
+]
+ADJECTIVES = ["great", "poor", "excellent", "cheap", "solid", "flimsy", "amazing", "terrible", "decent", "nice"]
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+OPERATIONS = ["recommend", "recommend_filtered", "recommend_cached", "add_feedback", "get_analytics", "compare_products"]
+
+
+# --- Synthetic catalog ---
+
+def make_catalog(path, products, reviews_per_product=3, aspect_density=2.0, seed=0):
+    """CSV in the shape of the real dataset, with precomputed aspects_sentiments."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(products):
+        category = rnd.choice(CATEGORIES)
+        name_aspects = rnd.sample(ASPECTS, 2)
+        product = {
+            "itemName": f"{category} item {i} with {name_aspects[0]}",
+            "category": category,
+            "description": f"A {rnd.choice(ADJECTIVES)} {category.lower()} product known for its {name_aspects[1]}",
+            "feature": "" if i % 3 else f"{name_aspects[0]}; {name_aspects[1]}",
+            "image": f"https://example.com/img/{i}.jpg" if i % 5 else None
+        }
+        for _ in range(max(1, int(rnd.expovariate(1 / reviews_per_product)))):
+            count = min(len(ASPECTS), np.random.default_rng(rnd.getrandbits(32)).poisson(aspect_density))
+            aspects = {
+                a: {"sentiment": rnd.choice(SENTIMENTS), "confidence": round(rnd.uniform(0.6, 1.0), 3)}
+                for a in rnd.sample(ASPECTS, count)
+            }
+            words = [f"{rnd.choice(ADJECTIVES)} {a}" for a in aspects] or [rnd.choice(ADJECTIVES)]
+            rows.append({
+                **product,
+                "reviewText": f"This has {' and '.join(words)} overall, would say it is {rnd.choice(ADJECTIVES)}",
+                "aspects_sentiments": json.dumps(aspects)
+            })
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return len(rows)
+
+
+# --- Deterministic model stand-ins ---
+
+def _digest(text):
+    return int(hashlib.md5(str(text).encode("utf-8")).hexdigest(), 16)
+
+
+class StubSentenceTransformer:
+    """Hashed bag of words, so related texts still land near each other."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in str(text).lower().split():
+                vectors[row, _digest(word) % self.dim] += 1.0
+        return vectors[0] if single else vectors
+
+
+class StubCrossEncoder:
+    """Word overlap between query and document."""
+
+    def predict(self, pairs, batch_size=32, **kwargs):
+        return np.array(
+            [len(set(q.lower().split()) & set(d.lower().split())) for q, d in pairs], dtype=np.float32
+        )
+
+
+class StubABSAPipeline:
+    """Label and score derived from a hash of the input."""
+
+    absa_source = "stub-absa"
+    absa_backend = "torch"
+
+    def __call__(self, texts, batch_size=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        out = []
+        for text in texts:
+            h = _digest(text)
+            out.append({"label": ("positive", "negative", "neutral")[h % 3], "score": 0.55 + (h % 45) / 100})
+        return out[0] if single else out
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Doc:
+    def __init__(self, text):
+        self.noun_chunks = [_Chunk(w) for w in re.findall(r"[A-Za-z]{4,}", text)[:4]]
+
+
+class StubSpacy:
+    """Words of four or more letters stand in for noun chunks."""
+
+    pipe_names = ["tok2vec", "tagger", "attribute_ruler", "parser"]
+
+    def __call__(self, text):
+        return _Doc(text)
+
+    def pipe(self, texts, batch_size=128, n_process=1, **kwargs):
+        for text in texts:
+            yield _Doc(text)
+
+
+def stub_recommender_class():
+    import recommender
+    from absa import AspectExtractor
+    from absa_cache import ABSACache
+
+    class StubRecommender(recommender.ProductRecommender):
+        def _load_sbert(self):
+            self.sbert_model_id = "stub-sbert"
+            self.sbert = StubSentenceTransformer()
+
+        def _load_cross_encoder(self):
+            with self.model_lock:
+                if self.stages["rerank"]: return
+                self.cross_encoder = StubCrossEncoder()
+                self._set_stage("rerank")
+
+        def _load_absa(self):
+            with self.model_lock:
+                if self.stages["absa"]: return
+                self.nlp = StubSpacy()
+                self.aspect_extractor = AspectExtractor(self.nlp, cache_size=self.aspect_chunk_cache_size)
+                self.absa_pipe = StubABSAPipeline()
+                if self.absa_cache_path:
+                    self.absa_cache = ABSACache(self.absa_cache_path, StubABSAPipeline.absa_source)
+                self._set_stage("absa")
+
+    return recommender, StubRecommender
+
+
+# --- Measurement ---
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def summarize(times):
+    ms = np.array(times) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "ops_per_sec": round(len(ms) / (ms.sum() / 1000), 1) if ms.sum() else None
+    }
+
+
+def timed(fn, iterations, args_for):
+    times = []
+    for i in range(iterations):
+        args = args_for(i)
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def run_size(products, args, workdir):
+    """One catalog size, in this process; returns its report."""
+    for d in ("data", "embeddings", "models"):
+        os.makedirs(os.path.join(workdir, d), exist_ok=True)
+    rows = make_catalog(
+        os.path.join(workdir, "data", "catalog.csv"), products,
+        args.reviews_per_product, args.aspect_density, args.seed
+    )
+
+    recommender, StubRecommender = stub_recommender_class()
+    recommender.DATA_DIR = os.path.join(workdir, "data")
+    recommender.EMB_DIR = os.path.join(workdir, "embeddings")
+    recommender.MODEL_DIR = os.path.join(workdir, "models")
+
+    start = time.perf_counter()
+    r = StubRecommender(
+        dataframe_name="catalog.csv", max_dataset_size=rows, index_type=args.index_type,
+        micro_batching=False, preprocess_workers=1
+    )
+    startup = time.perf_counter() - start
+
+    rnd = random.Random(args.seed)
+    ids = r.unique_df["item_unique_id"].tolist()
+    queries = [f"{rnd.choice(ADJECTIVES)} {' '.join(rnd.sample(ASPECTS, 2))}" for _ in range(args.iterations)]
+    feedback = [f"The {a} is {rnd.choice(ADJECTIVES)} but the {b} is {rnd.choice(ADJECTIVES)}"
+                for a, b in (rnd.sample(ASPECTS, 2) for _ in range(args.iterations))]
+
+    def uncached(query, **kwargs):
+        r.query_cache.clear()
+        r.query_aspect_cache.clear()
+        return r.recommend(query, **kwargs)
+
+    results = {
+        "recommend": timed(uncached, args.iterations, lambda i: (queries[i],)),
+        "recommend_filtered": timed(
+            lambda q, c: uncached(q, category_filter=c), args.iterations,
+            lambda i: (queries[i], CATEGORIES[i % len(CATEGORIES)])
+        ),
+        "recommend_cached": timed(r.recommend, args.iterations, lambda i: (queries[0],)),
+        "add_feedback": timed(r.add_feedback, args.iterations, lambda i: (rnd.choice(ids), feedback[i])),
+        "get_analytics": timed(r.get_analytics, args.iterations, lambda i: ()),
+        "compare_products": timed(r.compare_products, args.iterations, lambda i: (rnd.sample(ids, 3),)),
+    }
+    r.close()
+    return {
+        "products": len(ids), "reviews": rows, "startup_seconds": round(startup, 3),
+        "peak_rss_mb": peak_rss_mb(), "operations": results
+    }
+
+
+def run_isolated(products, args):
+    """run_size in a child process (fresh RSS high-water mark)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        result_path = os.path.join(workdir, "result.json")
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker", str(products), "--result", result_path,
+            "--iterations", str(args.iterations), "--reviews-per-product", str(args.reviews_per_product),
+            "--aspect-density", str(args.aspect_density), "--index-type", args.index_type, "--seed", str(args.seed)
+        ]
+        proc = subprocess.run(cmd, cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if proc.returncode != 0:
+            print(proc.stdout[-4000:])
+            raise RuntimeError(f"Benchmark for {products} products failed")
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def regressions(report, baseline, tolerance, min_ms=1.0):
+    """
+    (size, metric, before, after) for everything slower than tolerance x the
+    baseline; latencies under ``min_ms`` are timer noise and never count.
+    """
+    previous = {run["products"]: run for run in baseline.get("runs", [])}
+    found = []
+    for run in report["runs"]:
+        before = previous.get(run["products"])
+        if before is None:
+            continue
+        pairs = [("startup_seconds", before["startup_seconds"], run["startup_seconds"])]
+        for op, stats in run["operations"].items():
+            if op in before["operations"]:
+                pairs.append((f"{op} p95_ms", before["operations"][op]["p95_ms"], stats["p95_ms"]))
+        for metric, old, new in pairs:
+            if old and new > old * tolerance and (metric == "startup_seconds" or new >= min_ms):
+                found.append((run["products"], metric, old, new))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="catalog sizes (products)")
+    parser.add_argument("--iterations", type=int, default=100, help="calls per operation")
+    parser.add_argument("--reviews-per-product", type=float, default=3.0)
+    parser.add_argument("--aspect-density", type=float, default=2.0, help="mean aspects per review")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report here")
+    parser.add_argument("--baseline", default=None, help="earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor vs --baseline")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="p95 below this never counts as a regression")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        with open(args.result, "w") as f:
+            json.dump(run_size(args.worker, args, os.getcwd()), f)
+        return
+
+    report = {
+        "config": {k: getattr(args, k) for k in ("iterations", "reviews_per_product", "aspect_density", "index_type", "seed")},
+        "runs": []
+    }
+    header = f"{'products':>9} {'operation':<20} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ops/s':>9}"
+    print(header)
+    print("-" * len(header))
+    for products in args.sizes:
+        run = run_isolated(products, args)
+        report["runs"].append(run)
+        for op in OPERATIONS:
+            s = run["operations"][op]
+            print(f"{run['products']:>9} {op:<20} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['ops_per_sec']:>9.0f}")
+        print(f"{run['products']:>9} {'start-up':<20} {run['startup_seconds']:>8.2f}s   peak RSS {run['peak_rss_mb']} MB\n")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance, args.min_ms)
+        for products, metric, old, new in slower:
+            print(f"❌ {products} products: {metric} {old} -> {new} (> {args.tolerance}x)")
+        if slower:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance}x against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Throughput of the spaCy aspect-candidate extraction, before and after.
+
+    python scripts/benchmark_spacy.py                        # 5000 reviews, n_process 1/2/4
+    python scripts/benchmark_spacy.py --reviews 20000 --processes 1 4 8 --json spacy.json
+
+Bulk rows time the old path (the full ``disable``-loaded pipeline,
+single process) against ``AspectExtractor.extract_bulk`` with each
+--processes value, in docs/sec, and check the candidates are identical.
+The request rows time ``AspectExtractor.extract`` one query at a time over
+a skewed stream of short texts, with a cold and a warm chunk LRU.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import spacy
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, "..", "server"))
+
+from absa import AspectExtractor, load_spacy, extract_aspect_candidates  # noqa: E402
+
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+
+
+def load_reviews(dataframe, count, seed):
+    base = os.path.join(DATA_DIR, dataframe)
+    for path, reader in ((base + "_processed.parquet", pd.read_parquet), (base + "_processed.pkl", pd.read_pickle), (base, pd.read_csv)):
+        if os.path.exists(path):
+            reviews = reader(path)["reviewText"].dropna().astype(str)
+            reviews = reviews[reviews.str.len() > 15]
+            return reviews.sample(min(count, len(reviews)), random_state=seed).tolist()
+    raise FileNotFoundError(f"No data found for {dataframe} in {DATA_DIR}")
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    out = fn(texts)
+    return out, len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataframe", default="Second_fixed_image_urls.csv")
+    parser.add_argument("--reviews", type=int, default=5000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=2000, help="short texts for the request path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the results here")
+    args = parser.parse_args()
+
+    reviews = load_reviews(args.dataframe, args.reviews, args.seed)
+    print(f"{len(reviews)} reviews\n")
+    report = {"reviews": len(reviews), "bulk": [], "request": []}
+
+    header = f"{'path':<28} {'docs/sec':>10} {'speed-up':>8} {'identical':>9}"
+    print(header)
+    print("-" * len(header))
+    # Before: every component loaded, NER / lemmatizer only disabled
+    baseline_nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
+    baseline, base_rate = timed(lambda t: extract_aspect_candidates(baseline_nlp, t), reviews)
+    report["bulk"].append({"path": "baseline", "docs_per_sec": round(base_rate, 1)})
+    print(f"{'baseline (1 process)':<28} {base_rate:>10.0f} {1:>8.2f} {'-':>9}")
+    del baseline_nlp
+
+    nlp = load_spacy()
+    for n_process in args.processes:
+        extractor = AspectExtractor(nlp, n_process=n_process, batch_size=args.batch_size, bulk_min_texts=0)
+        out, rate = timed(extractor.extract_bulk, reviews)
+        identical = [sorted(a) for a in out] == [sorted(a) for a in baseline]
+        report["bulk"].append({
+            "path": "extract_bulk", "n_process": n_process, "docs_per_sec": round(rate, 1),
+            "speedup": round(rate / base_rate, 2), "identical": identical
+        })
+        print(f"{f'extract_bulk n_process={n_process}':<28} {rate:>10.0f} {rate / base_rate:>8.2f} {str(identical):>9}")
+
+    # Request path: short query-like strings, a few of them very common
+    rng = np.random.default_rng(args.seed)
+    pool = [" ".join(r.split()[:6]) for r in reviews[:500]]
+    stream = [pool[min(int(i), len(pool) - 1)] for i in rng.zipf(1.3, args.queries) - 1]
+    extractor = AspectExtractor(nlp, n_process=1)
+
+    def one_at_a_time(texts):
+        return [extractor.extract([t]) for t in texts]
+
+    _, old_rate = timed(lambda texts: [extract_aspect_candidates(nlp, [t]) for t in texts], stream)
+    _, cold_rate = timed(one_at_a_time, stream)
+    _, warm_rate = timed(one_at_a_time, stream)
+    stats = extractor.cache.stats()
+    print()
+    for label, rate in (("request, no LRU", old_rate), ("request, cold LRU", cold_rate), ("request, warm LRU", warm_rate)):
+        report["request"].append({"path": label, "docs_per_sec": round(rate, 1), "speedup": round(rate / old_rate, 2)})
+        print(f"{label:<28} {rate:>10.0f} {rate / old_rate:>8.2f}")
+    report["request_cache"] = stats
+    print(f"\n{len(set(stream))} distinct of {len(stream)} short texts, LRU: {stats}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
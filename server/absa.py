@@ -0,0 +1,223 @@
+import gc
+import os
+
+import torch
+import spacy
+from tqdm import tqdm
+from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+
+from absa_cache import absa_input
+from cache import LRUCache
+
+DEFAULT_ABSA_MODEL = "yangheng/deberta-v3-base-absa-v1.1"
+ABSA_BACKENDS = ("torch", "int8", "onnx")
+# Noun chunks that never make useful aspects
+STOP_ASPECTS = {"it", "this", "that", "product", "item"}
+# What a review with no usable aspects is recorded as
+NO_ASPECTS = {"general": {"sentiment": "Neutral", "confidence": 0.0}}
+
+# Model loading and scoring live at module level so that both the server
+# and the preprocessing worker processes (see preprocess.py) can use them.
+
+
+def load_spacy():
+    try:
+        print("Loading Spacy...")
+        return spacy.load("en_core_web_sm", exclude=["ner", "lemmatizer"])
+    except OSError:
+        print("Downloading spacy model...")
+        from spacy.cli import download
+        download("en_core_web_sm")
+        return spacy.load("en_core_web_sm", exclude=["ner", "lemmatizer"])
+
+
+def load_absa_pipeline(model_path, device="cpu", backend="torch"):
+    """
+    Text-classification pipeline for the ABSA model.
+
+    ``backend`` picks how it runs on CPU: ``torch`` (fp32 eager), ``int8``
+    (dynamic int8 quantization of the Linear layers) or ``onnx`` (ONNX
+    Runtime via optimum; the export is cached next to the model). Anything
+    unavailable falls back to ``torch`` with a warning; on CUDA only
+    ``torch`` is used. ``scripts/absa_parity.py`` compares the backends.
+    """
+    if backend not in ABSA_BACKENDS:
+        raise ValueError(f"Unknown ABSA backend {backend!r}; expected one of {', '.join(ABSA_BACKENDS)}")
+    if backend != "torch" and device == "cuda":
+        print(f"⚠️ ABSA backend '{backend}' is CPU-only, using torch on CUDA")
+        backend = "torch"
+
+    print(f"Loading ABSA model from {model_path}...")
+    try:
+        if os.path.exists(model_path):
+            print("Loading Tokenizer...")
+            # FORCE use_fast=False to avoid convert_slow_tokenizer error with DebertaV3
+            tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=False)
+            source = model_path
+        else:
+            raise FileNotFoundError("Local model path does not exist.")
+    except Exception as e:
+        print(f"⚠️ Failed to load local ABSA model: {e}")
+        print("Attempting to download default ABSA model from HuggingFace (requires internet)...")
+        # FORCE use_fast=False here as well
+        tokenizer = AutoTokenizer.from_pretrained(DEFAULT_ABSA_MODEL, use_fast=False)
+        source = DEFAULT_ABSA_MODEL
+
+    model = None
+    if backend == "onnx":
+        model = _load_onnx_model(source, model_path)
+        if model is None:
+            backend = "torch"
+    if model is None:
+        print("Loading Model...")
+        model = AutoModelForSequenceClassification.from_pretrained(source)
+        model.to(device)
+    if backend == "int8":
+        print("🏎️  Quantizing ABSA model to int8...")
+        try:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            print(f"⚠️ Failed to quantize ABSA model: {e}")
+            backend = "torch"
+
+    absa_pipe = pipeline(
+        "text-classification",
+        model=model,
+        tokenizer=tokenizer,
+        truncation=True,
+        device=0 if device == "cuda" else -1
+    )
+    # What actually runs, for cache keys and reporting
+    absa_pipe.absa_source = source
+    absa_pipe.absa_backend = backend
+    return absa_pipe
+
+
+def _load_onnx_model(source, model_path):
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError:
+        print("⚠️ optimum[onnxruntime] not installed. Falling back to the torch ABSA backend.")
+        return None
+    onnx_path = model_path.rstrip("/\\") + "-onnx"
+    try:
+        if os.path.exists(os.path.join(onnx_path, "model.onnx")):
+            print(f"Loading ONNX ABSA model from {onnx_path}...")
+            return ORTModelForSequenceClassification.from_pretrained(onnx_path)
+        print("Exporting ABSA model to ONNX (one-off)...")
+        model = ORTModelForSequenceClassification.from_pretrained(source, export=True)
+        model.save_pretrained(onnx_path)
+        return model
+    except Exception as e:
+        print(f"⚠️ ONNX export/load failed: {e}. Falling back to the torch ABSA backend.")
+        return None
+
+
+def pipeline_model_id(absa_pipe, default):
+    """Which checkpoint and backend a pipeline actually runs, for cache keys."""
+    source = getattr(absa_pipe, "absa_source", None) or default
+    backend = getattr(absa_pipe, "absa_backend", "torch")
+    # fp32 torch keeps the bare id so existing cache entries stay valid
+    return source if backend == "torch" else f"{source}#{backend}"
+
+
+def classify_pairs(predict, pairs, cache=None):
+    """ABSA outputs for ``(text, aspect)`` pairs, through ``cache`` (an ABSACache) if given."""
+    if cache is not None:
+        return cache.predict(predict, pairs)
+    return predict([absa_input(text, aspect) for text, aspect in pairs])
+
+
+def doc_aspects(doc):
+    """Up to three noun-chunk aspects of a parsed doc (``["general"]`` if none)."""
+    aspects = []
+    for chunk in doc.noun_chunks:
+        a = chunk.text.lower().strip()
+        if len(a) > 2 and a not in STOP_ASPECTS:
+            aspects.append(a)
+    return list(set(aspects))[:3] or ["general"]
+
+
+def extract_aspect_candidates(nlp, texts):
+    """Up to three noun-chunk aspects per text (``["general"]`` if none)."""
+    return [doc_aspects(doc) for doc in nlp.pipe(texts, batch_size=128)]
+
+
+class AspectExtractor:
+    """
+    Noun-chunk aspect candidates for the request and bulk paths.
+
+    ``extract`` serves short request texts (queries, feedback, fallback
+    snippets): one in-process ``nlp.pipe`` call over only the texts missing
+    from an LRU of recent results. ``extract_bulk`` serves review
+    preprocessing: no LRU, and ``nlp.pipe`` fans out over ``n_process``
+    processes once there are enough texts to pay for their start-up. The
+    pipeline itself is what ``noun_chunks`` needs (tok2vec, tagger,
+    attribute_ruler, parser); NER and the lemmatizer are excluded at load.
+    """
+
+    def __init__(self, nlp, n_process=1, batch_size=128, cache_size=4096, bulk_min_texts=2000):
+        self.nlp = nlp
+        self.n_process = max(1, n_process or 1)
+        self.batch_size = batch_size
+        self.bulk_min_texts = bulk_min_texts
+        self.cache = LRUCache(max_entries=cache_size)
+
+    def extract(self, texts):
+        texts = [str(t) for t in texts]
+        found = {t: self.cache.get(t) for t in set(texts)}
+        missing = [t for t, aspects in found.items() if aspects is None]
+        if missing:
+            # Short texts: one small batch, no process pool
+            for text, doc in zip(missing, self.nlp.pipe(missing, batch_size=max(len(missing), 1))):
+                found[text] = tuple(doc_aspects(doc))
+                self.cache.put(text, found[text])
+        return [list(found[t]) for t in texts]
+
+    def extract_bulk(self, texts):
+        texts = [str(t) for t in texts]
+        n_process = self.n_process if len(texts) >= self.bulk_min_texts else 1
+        docs = self.nlp.pipe(texts, batch_size=self.batch_size, n_process=n_process)
+        return [doc_aspects(doc) for doc in docs]
+
+
+def score_reviews(extractor, absa_pipe, reviews, chunk_size=400, batch_size=16, device="cpu", progress=True, cache=None):
+    """
+    Bulk aspect sentiments for ``reviews``. Candidates come from one
+    ``extractor.extract_bulk`` pass (an AspectExtractor); ABSA then runs
+    ``chunk_size`` reviews at a time.
+    """
+    def predict(texts):
+        with torch.inference_mode():
+            return absa_pipe(texts, batch_size=batch_size)
+
+    all_aspects = extractor.extract_bulk(reviews)
+    results = []
+    chunks = range(0, len(reviews), chunk_size)
+    for i in tqdm(chunks, desc="🔍 ABSA", disable=not progress):
+        batch_reviews = reviews[i:i + chunk_size]
+        batch_aspects = all_aspects[i:i + chunk_size]
+
+        meta = [(review, aspect) for review, aspects in zip(batch_reviews, batch_aspects) for aspect in aspects]
+        if not meta:
+            results.extend([NO_ASPECTS] * len(batch_reviews))
+            continue
+
+        outputs = classify_pairs(predict, meta, cache)
+
+        review_map = {}
+        for (review, aspect), out in zip(meta, outputs):
+            review_map.setdefault(review, {})
+            if out["score"] > 0.6:
+                review_map[review][aspect] = {
+                    "sentiment": out["label"].capitalize(),
+                    "confidence": out["score"]
+                }
+
+        for review in batch_reviews:
+            results.append(review_map.get(review, NO_ASPECTS))
+
+        gc.collect()
+        if device == "cuda":
+            torch.cuda.empty_cache()
+    return results
@@ -0,0 +1,123 @@
+import hashlib
+import sqlite3
+import threading
+
+
+class ABSACache:
+    """
+    Persistent content-addressed cache of ABSA outputs.
+
+    Keys are sha1(model id, text, aspect) so identical (review, aspect)
+    pairs are scored once, no matter which path (bulk preprocessing,
+    feedback, /analyze, search fallback or query analysis) asks first, and
+    results from another model are never reused. Backed by SQLite in WAL
+    mode, which lets preprocessing worker processes share the file.
+
+    Query and feedback texts are open-ended, so the table is capped at
+    ``max_entries`` rows (None: unbounded): past the cap the oldest written
+    rows are deleted, down to 90% of it so pruning is amortized.
+    """
+
+    def __init__(self, path, model_id, max_entries=2_000_000):
+        self.path = path
+        self.model_id = str(model_id)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS absa (key TEXT PRIMARY KEY, label TEXT, score REAL)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+        # Upper bound on the row count (replaced keys are counted twice);
+        # recounted only when it passes the cap
+        self.approx_entries = self.conn.execute("SELECT COUNT(*) FROM absa").fetchone()[0]
+
+    def key(self, text, aspect):
+        digest = hashlib.sha1(self.model_id.encode("utf-8"))
+        for part in (text, aspect):
+            digest.update(b"\0")
+            digest.update(str(part).encode("utf-8", "replace"))
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """``{key: {"label", "score"}}`` for the keys that are cached."""
+        keys = list(keys)
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, label, score FROM absa WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, label, score in rows:
+                    found[key] = {"label": label, "score": score}
+        return found
+
+    def put_many(self, items):
+        """Store ``(key, {"label", "score"})`` pairs."""
+        rows = [(key, out["label"], float(out["score"])) for key, out in items]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO absa VALUES (?, ?, ?)", rows)
+            self.approx_entries += len(rows)
+            if self.max_entries and self.approx_entries > self.max_entries:
+                self._prune()
+            self.conn.commit()
+
+    def _prune(self):
+        # REPLACE gives a row a new rowid, so rowid order is write order
+        entries = self.conn.execute("SELECT COUNT(*) FROM absa").fetchone()[0]
+        excess = entries - int(self.max_entries * 0.9) if entries > self.max_entries else 0
+        if excess:
+            self.conn.execute("DELETE FROM absa WHERE rowid IN (SELECT rowid FROM absa ORDER BY rowid LIMIT ?)", (excess,))
+            self.pruned += excess
+        self.approx_entries = entries - excess
+
+    def predict(self, predict, pairs):
+        """
+        ``predict`` outputs for ``(text, aspect)`` pairs, calling ``predict``
+        (on ABSA input strings) only for pairs not seen before, each once.
+        """
+        keys = [self.key(text, aspect) for text, aspect in pairs]
+        found = self.get_many(set(keys))
+        todo = {}
+        for key, (text, aspect) in zip(keys, pairs):
+            if key not in found and key not in todo:
+                todo[key] = absa_input(text, aspect)
+        if todo:
+            outputs = predict(list(todo.values()))
+            fresh = [(key, {"label": out["label"], "score": out["score"]}) for key, out in zip(todo, outputs)]
+            self.put_many(fresh)
+            found.update(fresh)
+        with self.lock:
+            self.misses += len(todo)
+            self.hits += len(keys) - len(todo)
+        return [found[key] for key in keys]
+
+    def stats(self):
+        # No COUNT(*) here: it scans the table under the lock every lookup
+        # needs, and /metrics scrapes this. Rows written by other processes
+        # show up after the next prune recount.
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self.approx_entries,
+                "max_entries": self.max_entries,
+                "pruned": self.pruned,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def absa_input(text, aspect):
+    """The sentence-pair string the ABSA classifier is run on."""
+    return f"[CLS] {text} [SEP] {aspect} [SEP]"
@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+
+from aspect_store import SENTIMENT_CODES
+
+
+class AnalyticsAggregates:
+    """
+    Dashboard counters kept up to date incrementally.
+
+    Built once from the AspectStore at startup; ``apply_update`` then moves
+    a single product's old aspect entries out of the counters and its new
+    ones in, so ``/analytics`` only has to pick the top-k rows.
+    """
+
+    def __init__(self, aspect_store, category_codes, categories):
+        self.aspect_store = aspect_store
+        self.categories = list(categories)
+        self.lock = threading.Lock()
+
+        arrays = aspect_store.arrays
+        owners, flat = aspect_store.entry_owners(None, arrays)
+        codes = arrays.codes[flat]
+        sentiments = arrays.sentiments[flat]
+        n_vocab = len(aspect_store.vocab)
+        n_categories = len(self.categories)
+
+        # One row per sentiment code (Positive, Negative, Neutral) x aspect
+        self.aspect_counts = {
+            code: np.bincount(codes[sentiments == code], minlength=n_vocab).astype(np.int64)
+            for code in SENTIMENT_CODES.values()
+        }
+        entry_categories = category_codes[owners]
+        self.category_counts = np.bincount(category_codes, minlength=n_categories).astype(np.int64)
+        self.category_sentiment = {
+            code: np.bincount(entry_categories[sentiments == code], minlength=n_categories).astype(np.int64)
+            for code in (1, -1)
+        }
+
+    def _grow(self):
+        n_vocab = len(self.aspect_store.vocab)
+        for code, counts in self.aspect_counts.items():
+            if len(counts) < n_vocab:
+                grown = np.zeros(max(n_vocab, len(counts) * 2), dtype=np.int64)
+                grown[:len(counts)] = counts
+                self.aspect_counts[code] = grown
+
+    def apply_update(self, category_code, old_segment, new_segment):
+        """
+        Swap one product's aspect entries in the aggregates.
+        Segments are ``(codes, sentiments)`` pairs as stored in the AspectStore.
+        """
+        with self.lock:
+            self._grow()
+            for sign, (codes, sentiments) in ((-1, old_segment), (1, new_segment)):
+                for code, sentiment in zip(codes, sentiments):
+                    sentiment = int(sentiment)
+                    self.aspect_counts[sentiment][code] += sign
+                    if sentiment in self.category_sentiment:
+                        self.category_sentiment[sentiment][category_code] += sign
+
+    @staticmethod
+    def _top(values, k):
+        """Indices of the k largest values, ties broken by lowest index."""
+        if len(values) == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if len(values) > k:
+            threshold = np.partition(values, len(values) - k)[len(values) - k]
+            candidates = np.flatnonzero(values >= threshold)
+        else:
+            candidates = np.arange(len(values))
+        order = np.argsort(-values[candidates], kind="stable")
+        return candidates[order][:k]
+
+    def snapshot(self, top_aspects=15, top_categories=10):
+        with self.lock:
+            n_vocab = len(self.aspect_store.vocab)
+            pos = self.aspect_counts[1][:n_vocab].copy()
+            neg = self.aspect_counts[-1][:n_vocab].copy()
+            neu = self.aspect_counts[0][:n_vocab].copy()
+            category_counts = self.category_counts.copy()
+            category_pos = self.category_sentiment[1].copy()
+            category_neg = self.category_sentiment[-1].copy()
+
+        totals = pos + neg + neu
+        aspects = [
+            {
+                "name": self.aspect_store.vocab[code],
+                "positive": int(pos[code]),
+                "negative": int(neg[code]),
+                "neutral": int(neu[code]),
+                "total": int(totals[code])
+            }
+            for code in self._top(totals, top_aspects) if totals[code] > 0
+        ]
+        categories = [
+            {
+                "name": self.categories[i],
+                "count": int(category_counts[i]),
+                "positive": int(category_pos[i]),
+                "negative": int(category_neg[i])
+            }
+            for i in self._top(category_counts, top_categories)
+        ]
+        return {
+            "total_aspects": int(np.count_nonzero(totals)),
+            "sentiment_distribution": {
+                "Positive": int(pos.sum()),
+                "Negative": int(neg.sum()),
+                "Neutral": int(neu.sum())
+            },
+            "top_aspects": aspects,
+            "top_categories": categories
+        }
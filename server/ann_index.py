@@ -0,0 +1,145 @@
+"""
+FAISS index construction for the product embeddings.
+
+All index types use inner product on L2-normalized vectors (cosine):
+
+- ``flat``: exact brute-force scan (the default).
+- ``ivf_flat``: inverted lists over k-means cells; ``nprobe`` cells are
+  scanned per query. Needs training.
+- ``ivf_pq``: IVF with product-quantized vectors (``pq_m`` bytes each),
+  much smaller in memory at some recall cost. Needs training.
+- ``hnsw``: graph index; ``ef_search`` trades recall for latency.
+
+Search-time settings (nprobe / ef_search) are applied after loading, so
+they can change without rebuilding; build settings are part of
+``signature()`` so a persisted index built differently is rebuilt.
+"""
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULT_PARAMS = {
+    "nlist": None,          # IVF cells; None -> ~4 * sqrt(n)
+    "pq_m": None,           # PQ sub-quantizers; None -> largest of 64/48/32/... dividing d
+    "hnsw_m": 32,           # HNSW graph degree
+    "ef_construction": 80,
+    "nprobe": 16,
+    "ef_search": 64,
+    "train_size": 100000    # vectors sampled for IVF / PQ training
+}
+BUILD_PARAMS = ("nlist", "pq_m", "hnsw_m", "ef_construction")
+
+
+def resolve_params(index_type, params=None):
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {', '.join(INDEX_TYPES)}")
+    resolved = dict(DEFAULT_PARAMS)
+    resolved.update({k: v for k, v in (params or {}).items() if v is not None})
+    return resolved
+
+
+def signature(index_type, params=None):
+    """Identifies how an index was built (not how it is searched)."""
+    params = resolve_params(index_type, params)
+    if index_type == "flat":
+        return "flat"
+    return index_type + ":" + ",".join(f"{k}={params[k]}" for k in BUILD_PARAMS)
+
+
+def _nlist(n, params):
+    if params["nlist"]:
+        return max(1, min(int(params["nlist"]), n))
+    # FAISS wants ~39+ training points per cell
+    return max(1, min(int(4 * np.sqrt(n)), n // 39 or 1))
+
+
+def _pq_m(d, params):
+    if params["pq_m"]:
+        return int(params["pq_m"])
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if d % m == 0 and m <= d // 4:
+            return m
+    return 1
+
+
+def build_index(embeddings, index_type="flat", params=None):
+    import faiss
+    params = resolve_params(index_type, params)
+    vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, d = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(d)  # Inner Product (Cosine Sim if normalized)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, int(params["hnsw_m"]), faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = int(params["ef_construction"])
+    else:
+        nlist = _nlist(n, params)
+        quantizer = faiss.IndexFlatIP(d)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            # 8-bit codes need 256 training points per sub-quantizer
+            nbits = int(min(8, max(1, np.log2(max(n, 2)) - 1)))
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, _pq_m(d, params), nbits, faiss.METRIC_INNER_PRODUCT)
+        train = vectors
+        if n > params["train_size"]:
+            rng = np.random.default_rng(0)
+            train = vectors[np.sort(rng.choice(n, int(params["train_size"]), replace=False))]
+        print(f"Training {index_type} index ({nlist} lists) on {len(train)} vectors...")
+        index.train(train)
+
+    index.add(vectors)
+    configure_search(index, params)
+    return index
+
+
+def rebuild(index, embeddings):
+    """
+    A copy of ``index`` re-filled with ``embeddings``, keeping its training
+    (IVF centroids, PQ codebooks) and search settings.
+    """
+    import faiss
+    fresh = faiss.clone_index(index)
+    fresh.reset()
+    fresh.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+    return fresh
+
+
+def configure_search(index, params=None):
+    """Apply nprobe / ef_search to a built or loaded index."""
+    import faiss
+    params = params if params and "nprobe" in params else resolve_params("flat", params)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(int(params["nprobe"]), ivf.nlist)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(params["ef_search"])
+    return index
+
+
+def search_params(index, selector, widen=1):
+    """
+    Per-query SearchParameters restricting ``index`` to ``selector``, of the
+    type the index expects. ``widen`` multiplies nprobe / efSearch, for
+    retrying a filtered search that came back short.
+    """
+    import faiss
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(ivf.nprobe * widen, ivf.nlist))
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch * widen)
+    return faiss.SearchParameters(sel=selector)
+
+
+def is_approximate(index):
+    """True for IVF / HNSW indexes, whose filtered searches may return fewer than k hits."""
+    import faiss
+    return faiss.try_extract_index_ivf(index) is not None or hasattr(index, "hnsw")
+
+
+def memory_bytes(index):
+    """Serialized size of the index, a close proxy for its resident memory."""
+    import faiss
+    return int(faiss.serialize_index(index).size)
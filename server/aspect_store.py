@@ -0,0 +1,218 @@
+import json
+from collections import namedtuple
+
+import numpy as np
+
+# Signed codes so that summing a slice gives (#positive - #negative)
+SENTIMENT_CODES = {"Positive": 1, "Negative": -1, "Neutral": 0}
+SENTIMENT_LABELS = {1: "Positive", -1: "Negative", 0: "Neutral"}
+
+
+def parse_aspects(raw):
+    """Decode one ``aspects_sentiments`` cell, tolerating bad/missing JSON."""
+    if isinstance(raw, dict):
+        return raw
+    try:
+        aspects = json.loads(raw)
+    except Exception:
+        return {}
+    return aspects if isinstance(aspects, dict) else {}
+
+
+# One consistent snapshot of the flat arrays; replaced as a whole (never
+# attribute by attribute) so a reader holding it can't mix generations
+AspectArrays = namedtuple("AspectArrays", "codes sentiments confidences bounds")
+
+
+class AspectStore:
+    """
+    Pre-parsed aspect sentiments for every unique product.
+
+    Aspect names are integer-coded against ``vocab``. Product ``i`` owns the
+    entries ``[starts[i], ends[i])`` of the flat ``codes`` / ``sentiments``
+    (int8, see SENTIMENT_CODES) / ``confidences`` (float32) arrays, held
+    together in ``arrays`` (an AspectArrays). Updates append a fresh segment
+    and repoint the product's ``bounds`` row at it in one assignment, so
+    readers see either the old or the new aspects. Growing and ``compact()``
+    publish new arrays with a single reference swap; readers take
+    ``arrays`` once per call. Writers (``update`` / ``compact``) must be
+    serialized by the caller.
+    """
+
+    def __init__(self, n_products):
+        self.vocab = []
+        self.vocab_index = {}
+        # bounds[i] = (start, end); starts/ends are views into it
+        self.arrays = AspectArrays(
+            np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.float32),
+            np.zeros((n_products, 2), dtype=np.int64)
+        )
+        self.size = 0  # used length of the flat arrays
+        # (#positive - #negative) / #aspects per product, used for filtering
+        self.sentiment_scores = np.zeros(n_products, dtype=np.float64)
+
+    @classmethod
+    def from_json(cls, values):
+        values = list(values)
+        store = cls(len(values))
+        bounds = store.bounds
+        codes, sentiments, confidences = [], [], []
+        for pos, raw in enumerate(values):
+            start = len(codes)
+            for name, data in parse_aspects(raw).items():
+                c, s, conf = store._encode(name, data)
+                codes.append(c)
+                sentiments.append(s)
+                confidences.append(conf)
+            bounds[pos] = (start, len(codes))
+        store.arrays = AspectArrays(
+            np.asarray(codes, dtype=np.int32), np.asarray(sentiments, dtype=np.int8),
+            np.asarray(confidences, dtype=np.float32), bounds
+        )
+        store.size = len(codes)
+        store._refresh_scores(np.arange(len(values)))
+        return store
+
+    @property
+    def codes(self):
+        return self.arrays.codes
+
+    @property
+    def sentiments(self):
+        return self.arrays.sentiments
+
+    @property
+    def confidences(self):
+        return self.arrays.confidences
+
+    @property
+    def bounds(self):
+        return self.arrays.bounds
+
+    @property
+    def starts(self):
+        return self.bounds[:, 0]
+
+    @property
+    def ends(self):
+        return self.bounds[:, 1]
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def _code(self, name):
+        code = self.vocab_index.get(name)
+        if code is None:
+            code = len(self.vocab)
+            self.vocab.append(name)
+            self.vocab_index[name] = code
+        return code
+
+    def _encode(self, name, data):
+        if not isinstance(data, dict):
+            data = {}
+        sentiment = SENTIMENT_CODES.get(data.get("sentiment", "Neutral"), 0)
+        try: confidence = float(data.get("confidence", 0) or 0)
+        except (TypeError, ValueError): confidence = 0.0
+        return self._code(name), sentiment, confidence
+
+    def segment(self, pos):
+        """(codes, sentiments, confidences) views for product ``pos``."""
+        arrays = self.arrays
+        s, e = arrays.bounds[pos].tolist()  # one read, not a view of a row being rewritten
+        return arrays.codes[s:e], arrays.sentiments[s:e], arrays.confidences[s:e]
+
+    def get(self, pos):
+        """Aspects of product ``pos`` as the ``{name: {sentiment, confidence}}`` dict used by the API."""
+        codes, sentiments, confidences = self.segment(pos)
+        return {
+            self.vocab[c]: {"sentiment": SENTIMENT_LABELS[int(s)], "confidence": round(float(conf), 6)}
+            for c, s, conf in zip(codes, sentiments, confidences)
+        }
+
+    def update(self, pos, aspects):
+        """Replace the aspects of product ``pos`` with the given dict."""
+        encoded = [self._encode(name, data) for name, data in aspects.items()]
+        n = len(encoded)
+        self._reserve(self.size + n)
+        arrays = self.arrays
+        start = self.size
+        for i, (c, s, conf) in enumerate(encoded):
+            arrays.codes[start + i] = c
+            arrays.sentiments[start + i] = s
+            arrays.confidences[start + i] = conf
+        self.size += n
+        # Publish the new segment last, in a single write
+        arrays.bounds[pos] = (start, start + n)
+        self._refresh_scores(np.array([pos]))
+
+    def _refresh_scores(self, positions):
+        arrays = self.arrays
+        owners, flat = self.entry_owners(positions, arrays)
+        net = np.bincount(owners, weights=arrays.sentiments[flat], minlength=len(positions))
+        lengths = np.bincount(owners, minlength=len(positions))
+        self.sentiment_scores[positions] = net / np.maximum(lengths, 1)
+
+    def lookup_codes(self, names):
+        """Vocabulary codes for the given aspect names (unknown names are skipped)."""
+        return np.array([self.vocab_index[n] for n in names if n in self.vocab_index], dtype=np.int32)
+
+    def match_counts(self, positions, query_codes):
+        """
+        For each product in ``positions``, how many of ``query_codes`` it has
+        with Positive and with Negative sentiment. Returns two int arrays.
+        """
+        if len(query_codes) == 0 or len(positions) == 0:
+            zeros = np.zeros(len(positions), dtype=np.int64)
+            return zeros, zeros.copy()
+        arrays = self.arrays
+        owners, flat = self.entry_owners(positions, arrays)
+        hit = np.isin(arrays.codes[flat], query_codes)
+        owners, sentiments = owners[hit], arrays.sentiments[flat][hit]
+        pos_hits = np.bincount(owners[sentiments == 1], minlength=len(positions))
+        neg_hits = np.bincount(owners[sentiments == -1], minlength=len(positions))
+        return pos_hits, neg_hits
+
+    def _reserve(self, needed):
+        arrays = self.arrays
+        capacity = len(arrays.codes)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        grown = []
+        for old in (arrays.codes, arrays.sentiments, arrays.confidences):
+            new = np.zeros(new_capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            grown.append(new)
+        # bounds is copied too: rows written from here on point past the old
+        # arrays, so they must not show up in a snapshot still using those
+        self.arrays = AspectArrays(*grown, arrays.bounds.copy())
+
+    def entry_owners(self, positions=None, arrays=None):
+        """
+        Flat view of the live entries of ``positions`` (default: all
+        products) as (owner, flat index) arrays, where ``owner`` indexes into
+        ``positions``. Lets callers aggregate with NumPy instead of looping.
+        Pass the ``arrays`` snapshot the flat indexes will be used with.
+        """
+        bounds = (arrays or self.arrays).bounds
+        bounds = bounds if positions is None else bounds[positions]
+        starts = bounds[:, 0]
+        lengths = bounds[:, 1] - starts
+        owners = np.repeat(np.arange(len(starts)), lengths)
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return owners, np.arange(len(owners)) + offsets
+
+    def orphaned(self):
+        """Number of flat entries no product points at any more."""
+        return self.size - int((self.ends - self.starts).sum())
+
+    def compact(self):
+        """Rewrite the flat arrays without entries orphaned by updates."""
+        arrays = self.arrays
+        owners, flat = self.entry_owners(None, arrays)
+        lengths = arrays.bounds[:, 1] - arrays.bounds[:, 0]
+        ends = np.cumsum(lengths)
+        bounds = np.stack([ends - lengths, ends], axis=1).astype(np.int64)
+        self.arrays = AspectArrays(arrays.codes[flat], arrays.sentiments[flat], arrays.confidences[flat], bounds)
+        self.size = len(flat)
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Coalesces model calls from concurrent requests into shared batches.
+
+    Callers ``submit`` a list of inputs and block until their slice of the
+    output is ready. A single worker thread takes the first pending request,
+    keeps collecting more for up to ``max_wait_ms`` or until
+    ``max_batch_size`` inputs are queued, runs ``fn`` once on the
+    concatenation and hands each caller back its own results.
+    ``on_batch(size, seconds)``, if given, is called after each batch.
+    """
+
+    def __init__(self, fn, max_batch_size=64, max_wait_ms=5, name="batcher", on_batch=None):
+        self.fn = fn
+        self.on_batch = on_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, inputs):
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        if self.closed:
+            return self.fn(inputs)
+        future = Future()
+        self.queue.put((inputs, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return self._drain()
+            batch, size = [first], len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+                size += len(nxt[0])
+            self._dispatch(batch)
+            if stop:
+                return self._drain()
+
+    def _drain(self):
+        # Requests that raced with close() still get an answer
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                self._dispatch([item])
+
+    def _dispatch(self, batch):
+        flat = [x for inputs, _ in batch for x in inputs]
+        start = time.perf_counter()
+        try:
+            outputs = self.fn(flat)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(flat)
+        if self.on_batch:
+            self.on_batch(len(flat), time.perf_counter() - start)
+        offset = 0
+        for inputs, future in batch:
+            future.set_result(outputs[offset:offset + len(inputs)])
+            offset += len(inputs)
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": self.queue_depth()
+        }
+
+    def close(self):
+        """Stop the worker after the requests already queued; later submits run inline."""
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join(timeout=5)
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def approx_size(value):
+    """Rough byte size of a JSON-like value (its serialized length)."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional TTL and entry/byte budgets.
+
+    get/put are O(1) (OrderedDict move_to_end / popitem); expired entries
+    are dropped lazily when read or when they reach the LRU end. Byte
+    accounting uses ``sizeof`` and is only done when ``max_bytes`` is set.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=None, ttl=None, sizeof=approx_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (value, expires_at, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self.entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self.entries[key] = (value, expires_at, size)
+            self.bytes += size
+            while self.entries and (
+                (self.max_entries and len(self.entries) > self.max_entries) or
+                (self.max_bytes and self.bytes > self.max_bytes)
+            ):
+                _, (_, oldest_expiry, oldest_size) = self.entries.popitem(last=False)
+                self.bytes -= oldest_size
+                if oldest_expiry is not None and time.time() >= oldest_expiry:
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def invalidate(self, predicate):
+        """Drop every entry whose value satisfies ``predicate``; returns how many were dropped."""
+        with self.lock:
+            stale = [key for key, (value, _, _) in self.entries.items() if predicate(value)]
+            for key in stale:
+                self.bytes -= self.entries.pop(key)[2]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def expire_within(self, seconds):
+        """Cap the remaining lifetime of every current entry at ``seconds``."""
+        cutoff = time.time() + seconds
+        with self.lock:
+            for key, (value, expires_at, size) in self.entries.items():
+                if expires_at is None or expires_at > cutoff:
+                    self.entries[key] = (value, cutoff, size)
+
+    def items(self):
+        """Snapshot of (key, value) pairs, least recently used first."""
+        with self.lock:
+            return [(k, v[0]) for k, v in self.entries.items()]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised when the inference queue is full."""
+
+
+class InferenceExecutor:
+    """
+    Size-limited thread pool for model work with admission control.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more
+    may wait; anything beyond that is rejected immediately with Overloaded
+    instead of piling up. ``timeout`` bounds how long a caller waits; work
+    still queued at that point is cancelled, work already running finishes
+    in the background (Python threads can't be interrupted) but keeps its
+    slot until it does, so the limits stay honest.
+    """
+
+    def __init__(self, max_workers=4, max_queue=32, timeout=30.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self.lock = threading.Lock()
+        self.pending = 0  # running + queued
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _release(self, _future):
+        with self.lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        with self.lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Overloaded()
+            self.pending += 1
+        try:
+            future = self.pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            # Cancelling the wrapper cancels the pool future if it hasn't started
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            raise
+
+    def stats(self):
+        with self.lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": min(self.pending, self.max_workers),
+                "queue_depth": max(self.pending - self.max_workers, 0),
+                "rejected": self.rejected,
+                "timeouts": self.timeouts
+            }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+
+
+class FeedbackLog:
+    """
+    Append-only JSON-lines log of feedback aspect deltas.
+
+    Each record is ``{"ts", "id", "aspects"}`` where ``aspects`` is the
+    ``{name: {sentiment, confidence}}`` dict merged into the product by one
+    feedback. Appends are flushed to the OS immediately and fsynced in
+    groups (every ``sync_every`` records or ``sync_interval`` seconds), so a
+    process crash loses nothing and a power loss at most one group.
+
+    ``rotate()`` starts a fresh file and returns the sealed segment; after the
+    caller has written the compacted base data it calls ``drop_segment``.
+    ``replay()`` reads a leftover segment first, then the live log, so a crash
+    mid-compaction only replays deltas that are already in the base (which is
+    harmless, records are overwrites).
+    """
+
+    def __init__(self, path, sync_every=32, sync_interval=1.0):
+        self.path = path
+        self.segment_path = path + ".compacting"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+        self.records = self._count(self.path) + self._count(self.segment_path)  # since last compaction
+        self.syncs = 0
+
+    @staticmethod
+    def _count(path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            return sum(1 for line in f if line.strip())
+
+    def append(self, product_id, aspects):
+        self.append_many([(product_id, aspects)])
+
+    def append_many(self, records):
+        """Append ``(product_id, aspects)`` records with a single write."""
+        ts = time.time()
+        data = "".join(json.dumps({"ts": ts, "id": pid, "aspects": aspects}) + "\n" for pid, aspects in records)
+        with self.lock:
+            self.file.write(data)
+            self.file.flush()
+            self.records += len(records)
+            self.unsynced += len(records)
+            if self.unsynced >= self.sync_every or time.monotonic() - self.synced_at >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.syncs += 1
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def replay(self):
+        """Yield ``(product_id, aspects)`` for every durable record, oldest first."""
+        for path in (self.segment_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    if isinstance(record, dict) and isinstance(record.get("aspects"), dict):
+                        yield record.get("id"), record["aspects"]
+
+    def rotate(self):
+        """Seal the current log for compaction and continue in a new file."""
+        with self.lock:
+            self._sync()
+            self.file.close()
+            if os.path.exists(self.segment_path):
+                # Previous compaction never finished: keep its records too
+                with open(self.segment_path, "a", encoding="utf-8") as seg, open(self.path, encoding="utf-8") as cur:
+                    seg.write(cur.read())
+                    seg.flush()
+                    os.fsync(seg.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.segment_path)
+            self.file = open(self.path, "a", encoding="utf-8")
+            self.records = 0
+        return self.segment_path
+
+    def drop_segment(self):
+        if os.path.exists(self.segment_path):
+            os.remove(self.segment_path)
+
+    def stats(self):
+        with self.lock:
+            return {"records": self.records, "unsynced": self.unsynced, "fsyncs": self.syncs}
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+
+
+class FeedbackWriter:
+    """
+    The only thread that writes feedback to disk.
+
+    ``submit`` enqueues an aspect delta on a bounded queue (blocking when it
+    is full, which throttles feedback instead of growing memory). The worker
+    takes everything queued, up to ``max_batch`` records, merges deltas for
+    the same product in arrival order, and appends the result to the log in
+    one write; it fsyncs once the queue is idle. Compaction runs on the same
+    thread after a flush once the log holds ``compact_every`` records, so no
+    two writers ever touch the files at once. ``close`` drains the queue.
+    """
+
+    def __init__(self, log, compact=None, compact_every=1000, max_queue=1024, max_batch=256):
+        self.log = log
+        self.compact = compact
+        self.compact_every = compact_every
+        self.max_batch = max_batch
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.flushes = 0
+        self.records_in = 0
+        self.records_out = 0
+        self.full_waits = 0
+        self.last_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.compactions = 0
+        self.errors = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, product_id, aspects):
+        if self.closed:
+            raise RuntimeError("Feedback writer is closed")
+        item = (product_id, dict(aspects))
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.full_waits += 1
+            self.queue.put(item)
+        with self.lock:
+            self.records_in += 1
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            batch, stop = [], first is None
+            if not stop:
+                batch.append(first)
+            while not stop and len(batch) < self.max_batch:
+                try:
+                    nxt = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                else:
+                    batch.append(nxt)
+            if batch:
+                self._flush(batch)
+            if stop:
+                return self._drain()
+
+    def _drain(self):
+        # Submits that raced with close()
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        if batch:
+            self._flush(batch)
+        self.log.sync()
+
+    @staticmethod
+    def _coalesce(batch):
+        # Deltas are per-aspect overwrites, so merging a product's deltas in
+        # order gives the same end state as applying them one by one
+        merged = {}
+        for product_id, aspects in batch:
+            merged.setdefault(product_id, {}).update(aspects)
+        return list(merged.items())
+
+    def _flush(self, batch):
+        started = time.time()
+        records = self._coalesce(batch)
+        try:
+            self.log.append_many(records)
+            if self.queue.empty():
+                self.log.sync()
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+            print(f"⚠️ Failed to persist {len(batch)} feedback records: {e}")
+            return
+        elapsed = (time.time() - started) * 1000
+        with self.lock:
+            self.flushes += 1
+            self.records_out += len(records)
+            self.last_flush_ms = elapsed
+            self.total_flush_ms += elapsed
+        if self.compact and self.log.records >= self.compact_every:
+            try:
+                self.compact()
+                with self.lock:
+                    self.compactions += 1
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                print(f"⚠️ Feedback compaction failed: {e}")
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queue_depth": self.queue_depth(),
+                "max_queue": self.queue.maxsize,
+                "records_submitted": self.records_in,
+                "records_written": self.records_out,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "mean_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+                "full_queue_waits": self.full_waits,
+                "compactions": self.compactions,
+                "errors": self.errors
+            }
+
+    def close(self, timeout=30):
+        """Write everything already submitted, fsync, and stop the thread."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join(timeout=timeout)
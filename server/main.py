@@ -1,9 +1,14 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import uvicorn
+import asyncio
+import json
 import os
 import sys
+import threading
+import time
 import traceback
 
 # FORCE OFFLINE MODE
@@ -13,7 +18,9 @@ os.environ['HF_HUB_OFFLINE'] = '1'
 # Add current dir to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from recommender import ProductRecommender
+from recommender import ProductRecommender, StageNotReady
+from executor import InferenceExecutor, Overloaded
+from metrics import Metrics
 
 app = FastAPI(title="Product Recommender API")
 
@@ -29,29 +36,112 @@ app.add_middleware(
 recommender = None
 startup_error = None
 
-@app.on_event("startup")
-def startup_event():
+# Model work runs here, not on the event loop; beyond workers + queue we shed load
+executor = InferenceExecutor(
+    max_workers=int(os.environ.get("INFERENCE_WORKERS", 4)),
+    max_queue=int(os.environ.get("INFERENCE_QUEUE", 32)),
+    timeout=float(os.environ.get("REQUEST_TIMEOUT_SECONDS", 30))
+)
+
+# Shared with the recommender, which records its stage timings here (GET /metrics)
+metrics = Metrics()
+metrics.histogram("http_request_duration_seconds", "HTTP request latency by route")
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Route templates, not raw paths, keep label cardinality bounded
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request_duration_seconds", time.perf_counter() - start,
+        method=request.method, route=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    return response
+
+# Offline jobs (merchandising, campaigns) send many queries per request
+MAX_BATCH_QUERIES = int(os.environ.get("MAX_BATCH_QUERIES", 256))
+MAX_TOP_N = int(os.environ.get("MAX_TOP_N", 100))
+BATCH_TIMEOUT_SECONDS = float(os.environ.get("BATCH_TIMEOUT_SECONDS", 300))
+
+def env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def load_recommender():
     global recommender, startup_error
-    print("🚀 Starting Server & Loading Models...")
     try:
-        recommender = ProductRecommender()
+        recommender = ProductRecommender(
+            # Result cache budget, tunable per deployment (see GET /cache/stats)
+            cache_max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 1000)),
+            cache_max_bytes=int(float(os.environ.get("CACHE_MAX_MB", 64)) * 1024 * 1024),
+            cache_ttl=int(os.environ.get("CACHE_TTL_SECONDS", 3600)),
+            # Serve retrieval-only search while ABSA / cross-encoder still load
+            staged_loading=os.environ.get("STAGED_LOADING", "1") != "0",
+            # flat | ivf_flat | ivf_pq | hnsw (see scripts/benchmark_ann.py for the trade-offs)
+            index_type=os.environ.get("INDEX_TYPE", "flat"),
+            # torch | int8 | onnx (see scripts/absa_parity.py before switching)
+            absa_backend=os.environ.get("ABSA_BACKEND", "torch"),
+            index_params={
+                "nlist": env_int("INDEX_NLIST"),
+                "nprobe": env_int("INDEX_NPROBE"),
+                "ef_search": env_int("INDEX_EF_SEARCH")
+            },
+            metrics=metrics
+        )
         print("✅ Model loaded successfully!")
     except Exception as e:
         startup_error = traceback.format_exc()
         print(f"❌ Error loading recommender:\n{startup_error}")
 
+@app.on_event("startup")
+def startup_event():
+    print("🚀 Starting Server & Loading Models...")
+    # Load in the background so the port opens immediately; poll GET /ready
+    threading.Thread(target=load_recommender, daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    executor.shutdown()
+    if recommender:
+        recommender.close()
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a blocking recommender call on the inference executor."""
+    try:
+        return await executor.run(fn, *args, **kwargs)
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Request timed out")
+    except StageNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
 @app.get("/")
-def read_root():
+async def read_root():
     if startup_error:
         return {"status": "error", "message": "Server failed to start correctly", "detail": startup_error}
+    if not recommender:
+        return {"status": "loading", "message": "Product Recommender API is starting up"}
     return {"status": "active", "message": "Product Recommender API is running"}
 
+@app.get("/ready")
+async def ready():
+    """Per-stage readiness; 200 once search can be served (retrieval stage)"""
+    if startup_error:
+        return JSONResponse(status_code=500, content={"ready": False, "error": startup_error})
+    if not recommender:
+        stages = {"retrieval": False, "absa": False, "rerank": False}
+        return JSONResponse(status_code=503, content={"ready": False, "stages": stages, "error": None})
+    return recommender.readiness()
+
 @app.get("/search")
-def search(
+async def search(
     q: str,
     category: str = None,
     min_sentiment: float = None,
-    sort_by: str = "relevance"
+    sort_by: str = "relevance",
+    debug: bool = False
 ):
     if startup_error:
          raise HTTPException(status_code=500, detail=f"Server startup failed: {startup_error}")
@@ -60,18 +150,70 @@ def search(
         raise HTTPException(status_code=503, detail="Model is still loading...")
     
     try:
-        results = recommender.recommend(
+        results = await run_inference(
+            recommender.recommend,
             q, 
             category_filter=category,
             min_sentiment_score=min_sentiment,
-            sort_by=sort_by
+            sort_by=sort_by,
+            debug=debug  # adds per-stage "timings_ms"
         )
         return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Search Error: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/search/stream")
+async def search_stream(
+    q: str,
+    category: str = None,
+    min_sentiment: float = None,
+    sort_by: str = "relevance"
+):
+    """
+    /search as NDJSON, one event per line: "retrieval" (index ranking),
+    "rerank" (final order), "explanation" (per-result fallback aspects)
+    and "done" (the full /search response); see recommend_stream.
+    """
+    if startup_error:
+        raise HTTPException(status_code=500, detail=f"Server startup failed: {startup_error}")
+    
+    if not recommender:
+        raise HTTPException(status_code=503, detail="Model is still loading...")
+
+    events = recommender.recommend_stream(
+        q,
+        category_filter=category,
+        min_sentiment_score=min_sentiment,
+        sort_by=sort_by
+    )
+    # Every step runs on the inference executor; the first one before the
+    # response starts, so overload / errors still map to status codes
+    try:
+        first = await run_inference(next, events, None)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Search Error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def ndjson():
+        event = first
+        try:
+            while event is not None:
+                yield json.dumps(event) + "\n"
+                event = await run_inference(next, events, None)
+        except Exception as e:
+            # Headers are already sent: report the failure in-band
+            print(f"Search Stream Error: {e}")
+            yield json.dumps({"stage": "error", "detail": getattr(e, "detail", str(e))}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
 class FeedbackRequest(BaseModel):
     product_id: str
     feedback: str
@@ -82,23 +224,63 @@ class AnalysisRequest(BaseModel):
 class CompareRequest(BaseModel):
     product_ids: list[str]
 
+class BatchQuery(BaseModel):
+    q: str
+    category: str = None
+    min_sentiment: float = None
+    sort_by: str = "relevance"
+    top_n: int = Field(10, ge=1, le=MAX_TOP_N)
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchQuery]
+    debug: bool = False
+
+@app.post("/search/batch")
+async def search_batch(data: BatchSearchRequest):
+    """Many /search queries in one call (shared encode / index search / rerank); results in input order"""
+    if startup_error:
+        raise HTTPException(status_code=500, detail=f"Server startup failed: {startup_error}")
+    
+    if not recommender:
+        raise HTTPException(status_code=503, detail="Model is still loading...")
+
+    if len(data.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    requests = [{
+        "query": item.q,
+        "category_filter": item.category,
+        "min_sentiment_score": item.min_sentiment,
+        "sort_by": item.sort_by,
+        "top_n_results": item.top_n
+    } for item in data.queries]
+    try:
+        # One executor slot for the whole batch, with a longer deadline than /search
+        return await run_inference(recommender.recommend_batch, requests, debug=data.debug, timeout=BATCH_TIMEOUT_SECONDS)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Batch Search Error: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/feedback")
-def submit_feedback(data: FeedbackRequest):
+async def submit_feedback(data: FeedbackRequest):
     if not recommender:
         raise HTTPException(status_code=503, detail="Model service unavailable")
     
-    result = recommender.add_feedback(data.product_id, data.feedback)
+    result = await run_inference(recommender.add_feedback, data.product_id, data.feedback)
     return result
 
 @app.post("/analyze")
-def analyze_text(data: AnalysisRequest):
+async def analyze_text(data: AnalysisRequest):
     if not recommender:
         raise HTTPException(status_code=503, detail="Model service unavailable")
     
-    return recommender.analyze_text_only(data.text)
+    return await run_inference(recommender.analyze_text_only, data.text)
 
 @app.get("/analytics")
-def get_analytics():
+async def get_analytics():
     """Get analytics data for dashboard"""
     if startup_error:
         raise HTTPException(status_code=500, detail=f"Server startup failed: {startup_error}")
@@ -107,6 +289,7 @@ def get_analytics():
         raise HTTPException(status_code=503, detail="Model is still loading...")
     
     try:
+        # Reads precomputed aggregates only, cheap enough for the event loop
         analytics = recommender.get_analytics()
         return analytics
     except Exception as e:
@@ -115,12 +298,13 @@ def get_analytics():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/compare")
-def compare_products(data: CompareRequest):
+async def compare_products(data: CompareRequest):
     """Compare multiple products side-by-side"""
     if not recommender:
         raise HTTPException(status_code=503, detail="Model service unavailable")
     
     try:
+        # No model calls, just lookups in the product/aspect stores
         comparison = recommender.compare_products(data.product_ids)
         return comparison
     except Exception as e:
@@ -128,5 +312,40 @@ def compare_products(data: CompareRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the in-memory caches"""
+    if not recommender:
+        raise HTTPException(status_code=503, detail="Model is still loading...")
+    
+    return recommender.cache_stats()
+
+@app.get("/feedback/stats")
+async def feedback_stats():
+    """Feedback writer queue depth, flush latency and log size"""
+    if not recommender:
+        raise HTTPException(status_code=503, detail="Model is still loading...")
+    
+    return recommender.persistence_stats()
+
+@app.get("/executor/stats")
+async def executor_stats():
+    """Inference executor load: in-flight and queued requests, rejections, timeouts"""
+    return executor.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text format: latency histograms plus cache, batching and queue gauges"""
+    stats = executor.stats()
+    samples = [
+        ("inference_executor_in_flight", "gauge", "Requests running on the inference executor", {}, stats["in_flight"]),
+        ("inference_executor_queue_depth", "gauge", "Requests waiting for an inference worker", {}, stats["queue_depth"]),
+        ("inference_executor_rejected_total", "counter", "Requests shed because the queue was full", {}, stats["rejected"]),
+        ("inference_executor_timeouts_total", "counter", "Requests that timed out", {}, stats["timeouts"]),
+    ]
+    if recommender:
+        samples += recommender.metric_samples()
+    return PlainTextResponse(metrics.render(samples), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
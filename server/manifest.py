@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def content_hash(text):
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()
+
+
+def fingerprint(model_id, hashes):
+    """Identity of a whole embedding matrix: model plus every row hash, in order."""
+    digest = hashlib.sha1(str(model_id).encode("utf-8"))
+    for h in hashes:
+        digest.update(h.encode("ascii"))
+    return digest.hexdigest()
+
+
+class EmbeddingManifest:
+    """
+    Describes what ``enriched_item_descriptions_embeddings.npy`` contains.
+
+    Row ``i`` of the matrix embeds the text whose sha1 is ``hashes[i]`` for
+    the product whose id hashes to ``id_hashes[i]``, encoded by
+    ``model_id``. Ids are stored hashed because a product id concatenates
+    its name, category, description and feature, which makes the raw ids
+    long. ``indexes`` maps an index
+    artifact name (e.g. ``"faiss"``) to the matrix fingerprint it was built
+    from, so a stale index is detected even when the row count is unchanged.
+    """
+
+    def __init__(self, model_id, dim, id_hashes=(), hashes=(), indexes=None):
+        self.model_id = model_id
+        self.dim = dim
+        self.id_hashes = list(id_hashes)
+        self.hashes = list(hashes)
+        self.indexes = dict(indexes or {})
+        self.legacy = False  # loaded from the raw-id format; rewrite it
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            # Manifests written before ids were hashed keep their rows reusable
+            id_hashes = data["id_hashes"] if "id_hashes" in data else [content_hash(i) for i in data["ids"]]
+            manifest = cls(data["model_id"], data["dim"], id_hashes, data["hashes"], data.get("indexes"))
+            manifest.legacy = "id_hashes" not in data
+            return manifest
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "model_id": self.model_id,
+                "dim": self.dim,
+                "id_hashes": self.id_hashes,
+                "hashes": self.hashes,
+                "indexes": self.indexes
+            }, f)
+        os.replace(tmp, path)
+
+    @property
+    def fingerprint(self):
+        return fingerprint(self.model_id, self.hashes)
+
+    def plan(self, id_hashes, hashes):
+        """
+        Match a new catalog (id hashes, text hashes) against this manifest.
+        Returns ``(src, dst)``
+        arrays of reusable rows (old row ``src[j]`` -> new row ``dst[j]``)
+        and the new rows that have to be (re-)encoded.
+        """
+        old_rows = {(i, h): row for row, (i, h) in enumerate(zip(self.id_hashes, self.hashes))}
+        src, dst, stale = [], [], []
+        for row, key in enumerate(zip(id_hashes, hashes)):
+            old = old_rows.get(key)
+            if old is None:
+                stale.append(row)
+            else:
+                src.append(old)
+                dst.append(row)
+        return np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64), np.array(stale, dtype=np.int64)
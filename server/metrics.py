@@ -0,0 +1,128 @@
+import bisect
+import threading
+import time
+
+# Seconds; covers cached hits (sub-ms) up to cold model calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _labels(labels, extra=None):
+    items = sorted(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for k, v in items
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    In-process metrics registry rendered in the Prometheus text format.
+
+    Histograms (latencies, batch sizes) are recorded as requests run;
+    gauges and counters (cache hits, queue depths, ...) are sampled from
+    the components' own ``stats()`` at scrape time and passed to ``render``.
+    A histogram name is declared once with its help text and buckets,
+    then observed per label set.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.families = {}  # name -> (help, buckets, {label items: _Histogram})
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            self.families.setdefault(name, (help_text, tuple(buckets), {}))
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self.lock:
+            _, buckets, series = self.families[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def render(self, samples=()):
+        """
+        Prometheus exposition text. ``samples`` are ``(name, type, help,
+        labels, value)`` tuples with type "gauge" or "counter"; None values
+        are skipped.
+        """
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets, series) in sorted(self.families.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(series.items()):
+                    labels = dict(key)
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels, ('le', _number(bound)))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(hist.sum)}")
+                    lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+        described = set()
+        for name, kind, help_text, labels, value in samples:
+            if value is None:
+                continue
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """
+    Lap timer for one request: ``lap(stage)`` records the time since the
+    previous lap as that stage into ``metric`` (labelled ``operation`` and
+    ``stage``) and keeps it for an optional per-request timing block.
+    """
+
+    def __init__(self, metrics, metric, operation):
+        self.metrics = metrics
+        self.metric = metric
+        self.operation = operation
+        self.start = self.last = time.perf_counter()
+        self.stages = {}
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        if self.metrics is not None:
+            self.metrics.observe(self.metric, elapsed, operation=self.operation, stage=stage)
+        return elapsed
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def timings_ms(self):
+        timings = {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+        timings["total"] = round(self.total() * 1000, 3)
+        return timings
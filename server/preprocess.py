@@ -0,0 +1,206 @@
+"""
+Offline, resumable ABSA preprocessing.
+
+Reviews are split into fixed-size shards that are scored by a pool of
+worker processes (each with its own spaCy + ABSA models). Every finished
+shard is written to ``<checkpoint_dir>/shard_NNNNN.json`` right away, so an
+interrupted run resumes with only the missing shards. The server uses this
+when it has to build the processed data from the CSV; it can also be run
+ahead of time::
+
+    python server/preprocess.py --dataframe Second_fixed_image_urls.csv --workers 8
+
+after which the server only assembles the checkpoints.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+
+from absa import ABSA_BACKENDS, AspectExtractor, load_spacy, load_absa_pipeline, score_reviews, pipeline_model_id
+from absa_cache import ABSACache
+
+# Models of a worker process, loaded once by _init_worker
+_worker_models = None
+
+
+def select_reviews(df, max_dataset_size):
+    """The review rows the server indexes: non-trivial reviews, capped."""
+    if "reviewText" in df.columns:
+        df = df[df["reviewText"].astype(str).str.len() > 15]
+    return df.head(max_dataset_size).reset_index(drop=True)
+
+
+def default_workers(device="cpu"):
+    # One GPU is shared better by one process; on CPU each worker holds a
+    # full copy of the ABSA model (~0.7 GB), hence the cap
+    if device == "cuda":
+        return 1
+    return max(1, min(os.cpu_count() or 1, 8))
+
+
+def _fingerprint(reviews, shard_size, model_id):
+    # Checkpoints from another ABSA model or backend are not reusable
+    digest = hashlib.sha1(f"{shard_size}\0{model_id}\0".encode())
+    for review in reviews:
+        digest.update(str(review).encode("utf-8", "replace"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _shard_path(checkpoint_dir, index):
+    return os.path.join(checkpoint_dir, f"shard_{index:05d}.json")
+
+
+def _write_json(path, value):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+def _init_worker(model_path, device, threads, cache_path, backend="torch", spacy_processes=1):
+    global _worker_models
+    torch.set_num_threads(threads)
+    torch.set_grad_enabled(False)
+    absa_pipe = load_absa_pipeline(model_path, device, backend)
+    cache = ABSACache(cache_path, pipeline_model_id(absa_pipe, model_path)) if cache_path else None
+    _worker_models = (AspectExtractor(load_spacy(), n_process=spacy_processes), absa_pipe, cache)
+
+
+def _score_shard(index, reviews, path, chunk_size, batch_size, device):
+    extractor, absa_pipe, cache = _worker_models
+    _write_json(path, score_reviews(extractor, absa_pipe, reviews, chunk_size, batch_size, device, progress=False, cache=cache))
+    return index
+
+
+def prepare_checkpoints(checkpoint_dir, reviews, shard_size, model_id):
+    """Reuse checkpoints only if they were made for exactly these reviews by ``model_id``."""
+    meta_path = os.path.join(checkpoint_dir, "meta.json")
+    meta = {
+        "fingerprint": _fingerprint(reviews, shard_size, model_id), "reviews": len(reviews),
+        "shard_size": shard_size, "model": model_id
+    }
+    try:
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                return
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir)
+    _write_json(meta_path, meta)
+
+
+def extract_aspects_sharded(
+    reviews,
+    checkpoint_dir,
+    absa_model_path,
+    device="cpu",
+    workers=None,
+    shard_size=2000,
+    chunk_size=400,
+    batch_size=16,
+    load_models=None,
+    cache_path=None,
+    backend="torch",
+    spacy_processes=1
+):
+    """
+    Aspect sentiments for every review (same output as ``score_reviews``),
+    computed shard by shard with checkpoints in ``checkpoint_dir``.
+
+    With one worker (or one pending shard) scoring runs in this process
+    using ``load_models()`` -> (extractor, absa_pipe, cache) if given, so
+    the caller's already loaded models are reused, and spaCy may use
+    ``spacy_processes`` processes. ``cache_path`` is the ABSACache database
+    shared by the worker processes.
+    """
+    reviews = list(reviews)
+    workers = workers or default_workers(device)
+    # Same "<model>#<backend>" form as pipeline_model_id
+    model_id = os.path.normpath(absa_model_path) if backend == "torch" else f"{os.path.normpath(absa_model_path)}#{backend}"
+    prepare_checkpoints(checkpoint_dir, reviews, shard_size, model_id)
+    shards = [(i, reviews[start:start + shard_size]) for i, start in enumerate(range(0, len(reviews), shard_size))]
+    pending = [(i, shard) for i, shard in shards if not os.path.exists(_shard_path(checkpoint_dir, i))]
+    if len(pending) < len(shards):
+        print(f"♻️  Resuming ABSA: {len(shards) - len(pending)}/{len(shards)} shards already done")
+
+    started = time.time()
+    if pending and (workers <= 1 or len(pending) == 1):
+        if load_models:
+            extractor, absa_pipe, cache = load_models()
+        else:
+            _init_worker(absa_model_path, device, torch.get_num_threads(), cache_path, backend, spacy_processes)
+            extractor, absa_pipe, cache = _worker_models
+        for done, (i, shard) in enumerate(pending, 1):
+            _write_json(_shard_path(checkpoint_dir, i), score_reviews(extractor, absa_pipe, shard, chunk_size, batch_size, device, cache=cache))
+            print(f"✅ ABSA shard {i} done ({done}/{len(pending)})")
+    elif pending:
+        workers = min(workers, len(pending))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"🔍 ABSA over {len(pending)} shards with {workers} worker processes...")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(absa_model_path, device, threads, cache_path, backend)
+        ) as pool:
+            futures = [
+                pool.submit(_score_shard, i, shard, _shard_path(checkpoint_dir, i), chunk_size, batch_size, device)
+                for i, shard in pending
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                print(f"✅ ABSA shard {future.result()} done ({done}/{len(pending)})")
+    if pending:
+        print(f"⏱️  ABSA preprocessing took {time.time() - started:.0f}s")
+
+    results = []
+    for i, _ in shards:
+        with open(_shard_path(checkpoint_dir, i)) as f:
+            results.extend(json.load(f))
+    return results
+
+
+def main():
+    from recommender import DATA_DIR, MODEL_DIR
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Precompute ABSA checkpoints for the server")
+    parser.add_argument("--dataframe", default="Second_fixed_image_urls.csv")
+    parser.add_argument("--max-dataset-size", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=400)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--spacy-processes", type=int, default=1, help="spaCy n_process when --workers is 1")
+    parser.add_argument("--backend", default="torch", choices=ABSA_BACKENDS)
+    parser.add_argument("--no-cache", action="store_true", help="don't use the shared ABSA result cache")
+    args = parser.parse_args()
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    df = select_reviews(pd.read_csv(os.path.join(DATA_DIR, args.dataframe)), args.max_dataset_size)
+    extract_aspects_sharded(
+        df["reviewText"].tolist(),
+        os.path.join(DATA_DIR, f"{args.dataframe}_absa_shards"),
+        os.path.join(MODEL_DIR, "deberta-v3-base-absa"),
+        device=device,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        cache_path=os.path.join(DATA_DIR, "absa_cache.sqlite") if not args.no_cache else None,
+        backend=args.backend,
+        spacy_processes=args.spacy_processes
+    )
+    print("Done. Start the server to assemble the processed data.")
+
+
+if __name__ == "__main__":
+    main()
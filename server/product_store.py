@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+
+class ProductStore:
+    """
+    Positional view over the unique products.
+
+    Row ``i`` of ``frame`` is FAISS/KNN id ``i``, so search results can be
+    hydrated with ``iloc`` and product ids resolved through a hash map
+    instead of scanning the ``item_unique_id`` column.
+    """
+
+    def __init__(self, df, unique_df):
+        self.frame = unique_df.reset_index(drop=True)
+        self.ids = self.frame["item_unique_id"].tolist()
+        self.positions = {item_id: pos for pos, item_id in enumerate(self.ids)}
+        codes, categories = pd.factorize(self.frame["category"].astype(str))
+        self.category_codes = codes.astype(np.int32)
+        self.categories = list(categories)
+        # Case-insensitive category codes for the search filter
+        filter_codes, filter_names = pd.factorize(self.frame["category"].astype(str).str.lower())
+        self.filter_codes = filter_codes.astype(np.int32)
+        self.filter_lookup = {name: code for code, name in enumerate(filter_names)}
+
+        # Review rows (positions in df) belonging to each product, used to
+        # mirror per-product updates back into the full review dataframe.
+        review_pos = df["item_unique_id"].map(self.positions).to_numpy()
+        order = np.argsort(review_pos, kind="stable")
+        counts = np.bincount(review_pos, minlength=len(self.ids))
+        self._review_order = order
+        self._review_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def category_filter_code(self, category):
+        """Code to compare against ``filter_codes``; -1 if no product has that category."""
+        return self.filter_lookup.get(str(category).lower(), -1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, item_id):
+        return item_id in self.positions
+
+    def position(self, item_id):
+        """Row position of a product id, or None if unknown."""
+        return self.positions.get(item_id)
+
+    def row(self, pos):
+        return self.frame.iloc[pos]
+
+    def get(self, item_id):
+        """Row for a product id, or None if unknown."""
+        pos = self.positions.get(item_id)
+        return None if pos is None else self.frame.iloc[pos]
+
+    def review_rows(self, pos):
+        """Positions in the full review dataframe for product ``pos``."""
+        return self._review_order[self._review_offsets[pos]:self._review_offsets[pos + 1]]
+
+    def set_value(self, pos, column, value):
+        self.frame.iat[pos, self.frame.columns.get_loc(column)] = value
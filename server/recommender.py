@@ -1,19 +1,29 @@
 import os
-import gc
 import json
+import shutil
 import torch
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-import spacy
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
 from sentence_transformers import SentenceTransformer, CrossEncoder
 from sklearn.neighbors import NearestNeighbors
 import joblib
 import threading
 import time
-from functools import lru_cache
-import hashlib
+import traceback
+
+from product_store import ProductStore
+from aspect_store import AspectStore, parse_aspects
+from analytics import AnalyticsAggregates
+from cache import LRUCache
+from batching import MicroBatcher
+from metrics import Metrics, StageTimer, BATCH_SIZE_BUCKETS
+from manifest import EmbeddingManifest, content_hash
+from feedback_log import FeedbackLog
+from feedback_writer import FeedbackWriter
+from absa import ABSA_BACKENDS, AspectExtractor, load_spacy, load_absa_pipeline, classify_pairs, pipeline_model_id
+from absa_cache import ABSACache
+import ann_index
+from preprocess import extract_aspects_sharded, select_reviews
 
 # Constants
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,6 +31,37 @@ DATA_DIR = os.path.join(BASE_DIR, "../data")
 EMB_DIR = os.path.join(BASE_DIR, "../embeddings")
 MODEL_DIR = os.path.join(BASE_DIR, "../models")
 
+# Columns of the processed data the server actually reads
+CACHE_COLUMNS = [
+    "itemName", "category", "description", "feature", "image",
+    "reviewText", "item_unique_id", "aspects_sentiments"
+]
+
+
+class StageNotReady(RuntimeError):
+    """A request needs a model that is still loading (staged startup)."""
+
+
+def product_text(item):
+    """Catalog part of ``enriched_text``; works on a row or a whole frame."""
+    return (
+        item["itemName"].astype(str) + " " + item["category"].astype(str) + " " +
+        item["description"].astype(str) + " " + item["feature"].astype(str)
+    ) if isinstance(item, pd.DataFrame) else " ".join(
+        str(item[col]) for col in ("itemName", "category", "description", "feature")
+    )
+
+
+def aspect_text(aspects):
+    """Confident aspects as "<aspect> <sentiment>" words appended to the embedded text."""
+    return " ".join(f"{a} {v['sentiment']}" for a, v in aspects.items() if v["confidence"] > 0.6)
+
+
+def normalize_query(text):
+    """Case- and whitespace-insensitive form of a query, used for cache keys."""
+    return " ".join(str(text).lower().split())
+
+
 class ProductRecommender:
 
     def __init__(
@@ -29,7 +70,34 @@ class ProductRecommender:
         max_dataset_size=200000,
         absa_chunk_size=400,
         absa_batch_size=16,
-        top_n=10
+        top_n=10,
+        query_aspect_cache_size=2048,
+        fallback_cache_size=20000,
+        cache_max_entries=1000,
+        cache_max_bytes=64 * 1024 * 1024,
+        cache_ttl=3600,
+        candidate_pool_factor=3,
+        filtered_exact_limit=4096,
+        vector_merge_threshold=1024,
+        feedback_cache_grace=30,
+        micro_batching=True,
+        batch_window_ms=5,
+        max_inference_batch=64,
+        staged_loading=False,
+        feedback_sync_every=32,
+        feedback_sync_interval=1.0,
+        feedback_compact_every=1000,
+        feedback_queue_size=1024,
+        preprocess_workers=None,
+        preprocess_shard_size=2000,
+        absa_result_cache=True,
+        absa_cache_max_entries=2_000_000,
+        index_type="flat",
+        index_params=None,
+        absa_backend="torch",
+        spacy_processes=None,
+        aspect_chunk_cache_size=4096,
+        metrics=None
     ):
         torch.set_grad_enabled(False)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -39,65 +107,287 @@ class ProductRecommender:
         
         # Caching paths
         self.dataframe_name = dataframe_name
-        self.cache_path = os.path.join(DATA_DIR, f"{dataframe_name}_processed.pkl")
+        self.cache_path = os.path.join(DATA_DIR, f"{dataframe_name}_processed.parquet")
+        self.legacy_cache_path = os.path.join(DATA_DIR, f"{dataframe_name}_processed.pkl")
 
         self.absa_chunk_size = absa_chunk_size
         self.absa_batch_size = absa_batch_size
+        # torch | int8 | onnx (see absa.load_absa_pipeline)
+        if absa_backend not in ABSA_BACKENDS:
+            raise ValueError(f"Unknown ABSA backend {absa_backend!r}; expected one of {', '.join(ABSA_BACKENDS)}")
+        self.absa_backend = absa_backend
+        # spaCy n_process for in-process bulk extraction (None: half the cores),
+        # and the LRU of noun-chunk candidates for request texts
+        self.spacy_processes = spacy_processes or max(1, (os.cpu_count() or 2) // 2)
+        self.aspect_chunk_cache_size = aspect_chunk_cache_size
         self.top_n = top_n
         self.max_dataset_size = max_dataset_size
+        # Bulk ABSA worker processes (None: sized to the machine) and shard size
+        self.preprocess_workers = preprocess_workers
+        self.preprocess_shard_size = preprocess_shard_size
+        # FAISS neighbours fetched per requested result; scoring is vectorized,
+        # so this can be raised without a per-candidate Python cost
+        self.candidate_pool_factor = candidate_pool_factor
+        # Filters keeping at most this many products are scored exactly;
+        # larger ones go through the index with an IDSelector
+        self.filtered_exact_limit = filtered_exact_limit
+        # Feedback re-embeddings are merged at query time until this many are
+        # pending, then folded into the index in the background
+        self.vector_merge_threshold = vector_merge_threshold
+        # After feedback, cached results it may change are served at most
+        # this many more seconds (results showing the product are dropped)
+        self.feedback_cache_grace = feedback_cache_grace
+        # FAISS index type (see ann_index.INDEX_TYPES) and its build/search settings
+        ann_index.resolve_params(index_type, index_params)
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        # Cross-request batching of SBERT / cross-encoder / ABSA calls
+        self.micro_batching = micro_batching
+        self.batch_window_ms = batch_window_ms
+        self.max_inference_batch = max_inference_batch
+        # Query ABSA memo, keyed by normalized text and independent of the
+        # result cache, so filter/sort variants reuse the same inference;
+        # the model itself sees the query as typed
+        self.query_aspect_cache = LRUCache(max_entries=query_aspect_cache_size)
+        # Per-stage latency / batch-size histograms (GET /metrics); shared with
+        # the API layer when it passes its own registry
+        self.metrics = metrics or Metrics()
+        self.metrics.histogram("recommender_stage_seconds", "Time spent per recommender pipeline stage")
+        self.metrics.histogram("recommender_operation_seconds", "End-to-end recommender call time")
+        self.metrics.histogram("inference_batch_size", "Inputs per micro-batched model call", BATCH_SIZE_BUCKETS)
+        self.metrics.histogram("inference_batch_seconds", "Model time per micro-batch")
+
+        # On-the-fly aspects for top-N products without pos/neg aspects,
+        # keyed by product id so each review text is analyzed once
+        self.fallback_cache_path = os.path.join(DATA_DIR, f"{dataframe_name}_fallback_aspects.pkl")
+        self.feedback_log_path = os.path.join(DATA_DIR, f"{dataframe_name}_feedback.jsonl")
+        self.fallback_cache = LRUCache(max_entries=fallback_cache_size)
+        self.fallback_save_lock = threading.Lock()
+        self.fallback_saved_at = time.time()
+        self._load_fallback_cache()
 
         self.dataframe_path = os.path.join(DATA_DIR, dataframe_name)
         self.emb_path = os.path.join(EMB_DIR, "enriched_item_descriptions_embeddings.npy")
         self.knn_path = os.path.join(EMB_DIR, "knn_model.pkl") 
+        # Content hashes of the rows in emb_path, for incremental re-embedding
+        self.manifest_path = os.path.join(EMB_DIR, "embeddings_manifest.json")
         self.absa_model_path = os.path.join(MODEL_DIR, "deberta-v3-base-absa")
+        # (text, aspect) -> ABSA output, shared by every path that runs ABSA
+        self.absa_cache_path = os.path.join(DATA_DIR, "absa_cache.sqlite") if absa_result_cache else None
+        self.absa_cache_max_entries = absa_cache_max_entries
+        self.absa_cache = None
+        # Per-shard ABSA results of an in-progress preprocessing run
+        self.absa_checkpoint_dir = os.path.join(DATA_DIR, f"{dataframe_name}_absa_shards")
 
-        print("Loading Data...")
-        self.df_original = pd.read_csv(self.dataframe_path)
+        # Raw CSV is only read when the processed cache is missing (see _original_df)
+        self.df_original = None
         
+        # Staged loading: SBERT + data + index come up first so retrieval-only
+        # search works; spaCy/ABSA and the cross-encoder load in the background
+        self.stages = {"retrieval": False, "absa": False, "rerank": False}
+        self.model_lock = threading.RLock()
+        self.loading_error = None
+
+        # Query result cache for faster repeated searches
+        self.query_cache = LRUCache(
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            ttl=cache_ttl
+        )
+        self._start_batchers()
+
         print("Loading Models...")
-        self._load_models()
+        if staged_loading:
+            self._load_sbert()
+        else:
+            self._load_models()
 
         print("Preparing Data & Index...")
         self.df = self._prepare_data()
+        # Feedback since the last compaction lives only in the log
+        self.feedback_log = FeedbackLog(self.feedback_log_path, sync_every=feedback_sync_every, sync_interval=feedback_sync_interval)
+        self.compaction_lock = threading.Lock()
+        self._replay_feedback_log()
+        # Single writer for feedback persistence (log appends + compaction)
+        self.feedback_writer = FeedbackWriter(
+            self.feedback_log,
+            compact=self.compact_feedback_log,
+            compact_every=feedback_compact_every,
+            max_queue=feedback_queue_size
+        )
         self._prepare_embeddings_and_index()
-        
-        # Query result cache for faster repeated searches
-        self.query_cache = {}  # {query_hash: (result, timestamp)}
-        self.cache_max_size = 100
-        self.cache_ttl = 3600  # 1 hour
+        self._set_stage("retrieval")
+
+        if staged_loading:
+            threading.Thread(target=self._load_remaining_models, daemon=True).start()
         
         print("Initialization Complete.")
 
+    def _original_df(self):
+        if self.df_original is None:
+            print("Loading Data...")
+            self.df_original = pd.read_csv(self.dataframe_path)
+        return self.df_original
+
     def _load_data_cache(self):
         if os.path.exists(self.cache_path):
             print(f"⚡ Loading cached processed data from {self.cache_path}...")
             try:
-                return pd.read_pickle(self.cache_path)
+                import pyarrow.parquet as pq
+                # Column projection: only read what the server uses
+                available = set(pq.read_schema(self.cache_path).names)
+                columns = [c for c in CACHE_COLUMNS if c in available]
+                return pd.read_parquet(self.cache_path, columns=columns, memory_map=True)
+            except ImportError:
+                print("⚠️ pyarrow not installed, can't read the Parquet cache.")
+            except Exception as e:
+                print(f"⚠️ Failed to load cache: {e}.")
+        if os.path.exists(self.legacy_cache_path):
+            print(f"⚡ Loading cached processed data from {self.legacy_cache_path}...")
+            try:
+                df = pd.read_pickle(self.legacy_cache_path)
+                if not os.path.exists(self.cache_path):
+                    self._save_data_cache(df)  # migrate to the columnar cache
+                return df
             except Exception as e:
                 print(f"⚠️ Failed to load cache: {e}. Reloading from CSV.")
         return None
 
     def _save_data_cache(self, df):
         print(f"💾 Saving processed data to {self.cache_path}...")
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.cache_path)
+            return True
+        except ImportError:
+            print("⚠️ pyarrow not installed. Falling back to pickle cache.")
+        except Exception as e:
+            # Not a pickle fallback: loading prefers the (older) Parquet file,
+            # so the caller must keep anything this save was meant to fold in
+            print(f"⚠️ Failed to save Parquet cache: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
         try:
-            df.to_pickle(self.cache_path)
+            df.to_pickle(self.legacy_cache_path)
+            # The pickle is the base now; a stale Parquet file would shadow it
+            if os.path.exists(self.cache_path):
+                os.remove(self.cache_path)
+            return True
         except Exception as e:
             print(f"⚠️ Failed to save cache: {e}")
+            return False
+
+    def _replay_feedback_log(self):
+        """Re-apply feedback logged after the processed data was last compacted."""
+        deltas = {}
+        count = 0
+        for product_id, aspects in self.feedback_log.replay():
+            deltas.setdefault(product_id, []).append(aspects)
+            count += 1
+        if not deltas:
+            return
+        ids = self.df["item_unique_id"]
+        base = self.df.drop_duplicates("item_unique_id").set_index("item_unique_id")["aspects_sentiments"]
+        updated = {}
+        for product_id, parts in deltas.items():
+            if product_id not in base.index: continue
+            current = parse_aspects(base[product_id])
+            for aspects in parts:
+                current.update(aspects)
+            updated[product_id] = json.dumps(current)
+        mask = ids.isin(updated.keys())
+        self.df.loc[mask, "aspects_sentiments"] = ids[mask].map(updated)
+        print(f"📝 Replayed {count} feedback records for {len(updated)} products")
+
+    def compact_feedback_log(self):
+        """Fold logged feedback into the processed data file and drop the log."""
+        with self.compaction_lock:
+            # Deltas are applied in memory before they are queued, so
+            # self.df already holds everything in the sealed segment
+            self.feedback_log.rotate()
+            # Feedback arriving during the write may or may not be included;
+            # it is in the new log either way and replaying it is idempotent
+            started = time.time()
+            if self._save_data_cache(self.df):
+                self.feedback_log.drop_segment()
+                print(f"✅ Compacted feedback log into {self.cache_path} ({(time.time() - started) * 1000:.0f}ms)")
+
+    def close(self):
+        """Drain queued feedback to disk, persist the fallback aspect cache and stop background workers; call on shutdown."""
+        self.feedback_writer.close()
+        self.feedback_log.close()
+        # Saves are throttled during serving; keep what was computed since the last one
+        self.save_fallback_cache()
+        if self.absa_cache:
+            self.absa_cache.close()
+        for batcher in self.batchers.values():
+            batcher.close()
+
+    def persistence_stats(self):
+        return {"writer": self.feedback_writer.stats(), "log": self.feedback_log.stats()}
+
+    def _load_fallback_cache(self):
+        if os.path.exists(self.fallback_cache_path):
+            try:
+                for product_id, aspects in joblib.load(self.fallback_cache_path):
+                    self.fallback_cache.put(product_id, aspects)
+                print(f"⚡ Loaded {len(self.fallback_cache)} cached fallback aspect sets")
+            except Exception as e:
+                print(f"⚠️ Failed to load fallback aspect cache: {e}")
+
+    def save_fallback_cache(self):
+        with self.fallback_save_lock:
+            self.fallback_saved_at = time.time()
+            try:
+                tmp_path = self.fallback_cache_path + ".tmp"
+                joblib.dump(self.fallback_cache.items(), tmp_path)
+                os.replace(tmp_path, self.fallback_cache_path)
+            except Exception as e:
+                print(f"⚠️ Failed to save fallback aspect cache: {e}")
+
+    def _fallback_aspects(self, recs):
+        """
+        Fresh aspects for the given (product_id, row) pairs. Cached products
+        are served from the LRU; the rest go through one batched ABSA call.
+        """
+        found, missing = {}, []
+        for product_id, row in recs:
+            if product_id in found: continue
+            found[product_id] = self.fallback_cache.get(product_id)
+            if found[product_id] is None:
+                missing.append((product_id, row))
+
+        if missing:
+            texts = []
+            for _, row in missing:
+                context_text = str(row.get("reviewText", ""))
+                if len(context_text) < 20: 
+                    context_text = f"{row['itemName']} {row['category']} {row['description']}"
+                texts.append(context_text[:1000])
+            
+            # Run on-the-fly extraction for all of them at once
+            fresh = self._extract_multi_aspects_many(texts, threshold=0.1)
+            for (product_id, _), aspects in zip(missing, fresh):
+                found[product_id] = aspects
+                self.fallback_cache.put(product_id, aspects)
+            if time.time() - self.fallback_saved_at > 60:
+                self.fallback_saved_at = time.time()
+                threading.Thread(target=self.save_fallback_cache, daemon=True).start()
+        return found
 
     def _load_models(self):
-        # --- LOAD SPACE ---
-        try:
-            print("Loading Spacy...")
-            self.nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
-        except OSError:
-            print("Downloading spacy model...")
-            from spacy.cli import download
-            download("en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
-        
+        self._load_sbert()
+        self._load_absa()
+        self._load_cross_encoder()
+        print("Models Loaded.")
+
+    def _load_sbert(self):
         # --- LOAD SBERT ---
         print("Loading SBERT...")
         sbert_path = os.path.join(MODEL_DIR, "all-MiniLM-L6-v2")
+        self.sbert_model_id = "sentence-transformers/all-MiniLM-L6-v2"
         if os.path.exists(sbert_path):
             print(f"Loading local SBERT from {sbert_path}...")
             self.sbert = SentenceTransformer(sbert_path, device=self.device)
@@ -107,135 +397,180 @@ class ProductRecommender:
                 "all-MiniLM-L6-v2",
                 device=self.device
             )
+
+    def _load_cross_encoder(self):
+        with self.model_lock:
+            if self.stages["rerank"]: return
+            # --- LOAD CROSS ENCODER ---
+            print("Loading Cross-Encoder...")
+            ce_path = os.path.join(MODEL_DIR, "ms-marco-MiniLM-L-6-v2")
+            if os.path.exists(ce_path):
+                 self.cross_encoder = CrossEncoder(ce_path, device=self.device)
+            else:
+                 print("⚠️ Local Cross-Encoder not found. Downloading...")
+                 self.cross_encoder = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2", device=self.device)
             
-        # --- LOAD CROSS ENCODER ---
-        print("Loading Cross-Encoder...")
-        ce_path = os.path.join(MODEL_DIR, "ms-marco-MiniLM-L-6-v2")
-        if os.path.exists(ce_path):
-             self.cross_encoder = CrossEncoder(ce_path, device=self.device)
-        else:
-             print("⚠️ Local Cross-Encoder not found. Downloading...")
-             self.cross_encoder = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2", device=self.device)
-        
-        # Quantize for CPU speedup
-        if self.device == "cpu":
-            print("🏎️  Quantizing Cross-Encoder for CPU...")
-            try:
-                # Quantize the underlying transformer model (usually DistilBert or similar)
-                # qint8 quantization for Linear layers provides ~2x speedup on CPU
-                self.cross_encoder.model = torch.quantization.quantize_dynamic(
-                    self.cross_encoder.model, {torch.nn.Linear}, dtype=torch.qint8
+            # Quantize for CPU speedup
+            if self.device == "cpu":
+                print("🏎️  Quantizing Cross-Encoder for CPU...")
+                try:
+                    # Quantize the underlying transformer model (usually DistilBert or similar)
+                    # qint8 quantization for Linear layers provides ~2x speedup on CPU
+                    self.cross_encoder.model = torch.quantization.quantize_dynamic(
+                        self.cross_encoder.model, {torch.nn.Linear}, dtype=torch.qint8
+                    )
+                except Exception as e:
+                    print(f"⚠️ Failed to quantize model: {e}")
+            self._set_stage("rerank")
+
+    def _load_absa(self):
+        """spaCy (aspect candidates) + DeBERTa ABSA; safe to call more than once."""
+        with self.model_lock:
+            if self.stages["absa"]: return
+            # --- LOAD SPACE ---
+            self.nlp = load_spacy()
+            self.aspect_extractor = AspectExtractor(
+                self.nlp, n_process=self.spacy_processes, cache_size=self.aspect_chunk_cache_size
+            )
+
+            # --- LOAD ABSA ---
+            self.absa_pipe = load_absa_pipeline(self.absa_model_path, self.device, self.absa_backend)
+            if self.absa_cache_path:
+                self.absa_cache = ABSACache(
+                    self.absa_cache_path, pipeline_model_id(self.absa_pipe, self.absa_model_path), self.absa_cache_max_entries
                 )
-            except Exception as e:
-                print(f"⚠️ Failed to quantize model: {e}")
-        # --- LOAD ABSA ---
-        print(f"Loading ABSA model from {self.absa_model_path}...")
+            self._set_stage("absa")
+
+    def _set_stage(self, stage):
+        self.stages[stage] = True
+        print(f"✅ Stage ready: {stage}")
+
+    def _load_remaining_models(self):
+        """Background half of staged loading: ABSA explanations, then reranking."""
         try:
-            if os.path.exists(self.absa_model_path):
-                print("Loading Tokenizer...")
-                # FORCE use_fast=False to avoid convert_slow_tokenizer error with DebertaV3
-                tokenizer = AutoTokenizer.from_pretrained(self.absa_model_path, use_fast=False)
-                
-                print("Loading Model...")
-                model = AutoModelForSequenceClassification.from_pretrained(
-                    self.absa_model_path
-                )
-                model.to(self.device)
-            else:
-                raise FileNotFoundError("Local model path does not exist.")
-        except Exception as e:
-            print(f"⚠️ Failed to load local ABSA model: {e}")
-            print("Attempting to download default ABSA model from HuggingFace (requires internet)...")
-            model_name = "yangheng/deberta-v3-base-absa-v1.1" 
-            # FORCE use_fast=False here as well
-            tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=False)
-            model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
-
-        self.absa_pipe = pipeline(
-            "text-classification",
-            model=model,
-            tokenizer=tokenizer,
-            truncation=True,
-            device=0 if self.device == "cuda" else -1
-        )
-        print("Models Loaded.")
+            self._load_absa()
+            self._load_cross_encoder()
+            print("Models Loaded.")
+        except Exception:
+            self.loading_error = traceback.format_exc()
+            print(f"❌ Background model loading failed:\n{self.loading_error}")
+
+    def readiness(self):
+        """Which pipeline stages are available; search works once 'retrieval' is."""
+        return {
+            "ready": all(self.stages.values()),
+            "stages": dict(self.stages),
+            "error": self.loading_error
+        }
+
+    def _require_absa(self):
+        if not self.stages["absa"]:
+            raise StageNotReady("Aspect sentiment model is still loading")
+
+    def _start_batchers(self):
+        """
+        Per-model micro-batchers shared by all request threads, so concurrent
+        searches run one larger forward pass instead of many tiny ones.
+        Bulk preprocessing calls the models directly.
+        """
+        if not self.micro_batching:
+            self.batchers = {}
+            return
+
+        def run_absa(texts):
+            with torch.inference_mode():
+                return self.absa_pipe(texts, batch_size=self.absa_batch_size)
+
+        def run_sbert(texts):
+            return self.sbert.encode(texts, batch_size=64, convert_to_numpy=True)
+
+        def run_cross_encoder(pairs):
+            return self.cross_encoder.predict(pairs, batch_size=64)
+
+        def on_batch(name):
+            def record(size, seconds):
+                self.metrics.observe("inference_batch_size", size, model=name)
+                self.metrics.observe("inference_batch_seconds", seconds, model=name)
+            return record
+
+        self.batchers = {
+            name: MicroBatcher(
+                fn, max_batch_size=self.max_inference_batch, max_wait_ms=self.batch_window_ms,
+                name=name, on_batch=on_batch(name)
+            )
+            for name, fn in (("sbert", run_sbert), ("cross_encoder", run_cross_encoder), ("absa", run_absa))
+        }
+
+    def _encode(self, texts):
+        if "sbert" in self.batchers: return self.batchers["sbert"].submit(texts)
+        return self.sbert.encode(texts, convert_to_numpy=True)
+
+    def _predict_ce(self, pairs):
+        if "cross_encoder" in self.batchers: return self.batchers["cross_encoder"].submit(pairs)
+        return self.cross_encoder.predict(pairs)
+
+    def _absa(self, texts):
+        if "absa" in self.batchers: return self.batchers["absa"].submit(texts)
+        with torch.inference_mode():
+            return self.absa_pipe(texts, batch_size=self.absa_batch_size)
+
+    def _classify(self, pairs):
+        """ABSA for (text, aspect) pairs via the persistent result cache; only unseen pairs hit the model."""
+        return classify_pairs(self._absa, pairs, self.absa_cache)
 
     def _extract_aspects_batch(self, texts):
-        aspects_list = []
-        for doc in self.nlp.pipe(texts, batch_size=128):
-            aspects = []
-            for chunk in doc.noun_chunks:
-                a = chunk.text.lower().strip()
-                if len(a) > 2 and a not in {"it", "this", "that", "product", "item"}:
-                    aspects.append(a)
-            aspects_list.append(list(set(aspects))[:3] or ["general"])
-        return aspects_list
+        return self.aspect_extractor.extract(texts)
 
     def _extract_multi_aspects_single(self, text, threshold=0.6, max_aspects=None):
-        aspects = self._extract_aspects_batch([text])[0]
+        return self._extract_multi_aspects_many([text], threshold=threshold, max_aspects=max_aspects)[0]
+
+    def _extract_multi_aspects_many(self, texts, threshold=0.6, max_aspects=None):
+        """Aspect sentiments for several texts with one spaCy pass and one batched ABSA call."""
+        aspects_list = self._extract_aspects_batch(texts)
         
-        # Limit aspects for faster processing (especially for feedback)
-        if max_aspects and len(aspects) > max_aspects:
-            aspects = aspects[:max_aspects]
+        pairs, meta = [], []
+        for i, (text, aspects) in enumerate(zip(texts, aspects_list)):
+            # Limit aspects for faster processing (especially for feedback)
+            if max_aspects and len(aspects) > max_aspects:
+                aspects = aspects[:max_aspects]
+            for aspect in aspects:
+                pairs.append((text, aspect))
+                meta.append((i, aspect))
         
-        results = {}
-        inputs, meta = [], []
-        for aspect in aspects:
-            inputs.append(f"[CLS] {text} [SEP] {aspect} [SEP]")
-            meta.append(aspect)
-        if not inputs: return {}
+        results = [{} for _ in texts]
+        if not pairs: return results
 
         with torch.no_grad():
-             outputs = self.absa_pipe(inputs)
+             outputs = self._classify(pairs)
         
-        for aspect, out in zip(meta, outputs):
+        for (i, aspect), out in zip(meta, outputs):
             if out["score"] > threshold:
-                 results[aspect] = {
+                 results[i][aspect] = {
                     "sentiment": out["label"].capitalize(),
                     "confidence": out["score"]
                 }
         return results
 
     def _extract_multi_aspects(self, reviews):
-        results = []
-        for i in tqdm(range(0, len(reviews), self.absa_chunk_size), desc="🔍 ABSA"):
-            batch_reviews = reviews[i:i + self.absa_chunk_size]
-            batch_aspects = self._extract_aspects_batch(batch_reviews)
-
-            texts, meta = [], []
-            for review, aspects in zip(batch_reviews, batch_aspects):
-                for aspect in aspects:
-                    texts.append(f"[CLS] {review} [SEP] {aspect} [SEP]")
-                    meta.append((review, aspect))
-            
-            if not texts:
-                results.extend([{"general": {"sentiment": "Neutral", "confidence": 0.0}}] * len(batch_reviews))
-                continue
-
-            with torch.inference_mode(): 
-                outputs = self.absa_pipe(texts, batch_size=self.absa_batch_size)
+        """Bulk ABSA for the catalog: sharded over worker processes, checkpointed, resumable."""
+        def models():
+            self._load_absa()
+            return self.aspect_extractor, self.absa_pipe, self.absa_cache
 
-            review_map = {}
-            for (review, aspect), out in zip(meta, outputs):
-                review_map.setdefault(review, {})
-                if out["score"] > 0.6:
-                    review_map[review][aspect] = {
-                        "sentiment": out["label"].capitalize(),
-                        "confidence": out["score"]
-                    }
-
-            for review in batch_reviews:
-                results.append(
-                    review_map.get(
-                        review,
-                        {"general": {"sentiment": "Neutral", "confidence": 0.0}}
-                    )
-                )
-
-            gc.collect()
-            if self.device == "cuda":
-                torch.cuda.empty_cache()
-        return results
+        return extract_aspects_sharded(
+            reviews,
+            self.absa_checkpoint_dir,
+            self.absa_model_path,
+            device=self.device,
+            workers=self.preprocess_workers,
+            shard_size=self.preprocess_shard_size,
+            chunk_size=self.absa_chunk_size,
+            batch_size=self.absa_batch_size,
+            load_models=models,
+            cache_path=self.absa_cache_path,
+            backend=self.absa_backend,
+            spacy_processes=self.spacy_processes
+        )
 
     def _prepare_data(self):
         # 1. Try cache
@@ -244,10 +579,7 @@ class ProductRecommender:
             return cached_df
 
         # 2. Process from scratch
-        df = self.df_original.copy()
-        if "reviewText" in df.columns:
-            df = df[df["reviewText"].astype(str).str.len() > 15]
-        df = df.head(self.max_dataset_size).reset_index(drop=True)
+        df = select_reviews(self._original_df().copy(), self.max_dataset_size)
         
         for col in ["description", "feature"]:
             if col not in df.columns: df[col] = ""
@@ -258,261 +590,511 @@ class ProductRecommender:
             df["description"] + df["feature"]
         )
 
-        if "aspects_sentiments" not in df.columns:
+        absa_ran = "aspects_sentiments" not in df.columns
+        if absa_ran:
             print("Extracting aspects (this may take a while)...")
             aspects = self._extract_multi_aspects(df["reviewText"].tolist())
             df["aspects_sentiments"] = [json.dumps(x) for x in aspects]
         
         # 3. Save Cache
-        self._save_data_cache(df)
+        if self._save_data_cache(df) and absa_ran:
+            # Checkpoints are only needed until the processed data is on disk
+            shutil.rmtree(self.absa_checkpoint_dir, ignore_errors=True)
         return df
 
     def _prepare_embeddings_and_index(self):
         def enrich(row):
             try: aspects = json.loads(row["aspects_sentiments"])
             except: aspects = {}
-            return " ".join(f"{a} {v['sentiment']}" for a, v in aspects.items() if v["confidence"] > 0.6)
+            return aspect_text(aspects)
 
-        self.df["enriched_text"] = (
-            self.df["itemName"].astype(str) + " " + self.df["category"].astype(str) + " " +
-            self.df["description"].astype(str) + " " + self.df["feature"].astype(str) + " " +
-            self.df.apply(enrich, axis=1)
+        # Only the first review row of each product is indexed, so only enrich those
+        unique_df = self.df.drop_duplicates("item_unique_id").copy()
+        unique_df["enriched_text"] = product_text(unique_df) + " " + unique_df.apply(enrich, axis=1)
+
+        # Row i of unique_df is index id i (see ProductStore)
+        self.products = ProductStore(self.df, unique_df)
+        self.item_ids = self.products.ids
+        self.unique_df = self.products.frame
+        # Decode aspects once; request paths read these arrays, not JSON
+        self.aspects = AspectStore.from_json(self.unique_df["aspects_sentiments"])
+        self.analytics = AnalyticsAggregates(self.aspects, self.products.category_codes, self.products.categories)
+        self.feedback_lock = threading.Lock()
+
+        # Kept for exact scoring of small filtered subsets
+        self.embeddings = self._load_or_update_embeddings()
+        self.index = None
+        # Vectors re-encoded after feedback and not yet in the index:
+        # (sorted positions, vectors, stale mask), merged at query time
+        self.vector_lock = threading.Lock()
+        self.vector_delta = (
+            np.zeros(0, dtype=np.int64),
+            np.zeros((0, self.embeddings.shape[1]), dtype=np.float32),
+            np.zeros(len(self.item_ids), dtype=bool)
         )
+        # Every vector re-encoded since start, (sorted positions, vectors),
+        # overriding the stored matrix for exact scoring
+        self.vector_overrides = self.vector_delta[:2]
+        self.vector_merging = False
 
-        unique_df = self.df.drop_duplicates("item_unique_id")
-        self.item_ids = unique_df["item_unique_id"].tolist()
-        self.unique_df = unique_df 
-
-        if os.path.exists(self.emb_path):
-            embeddings = np.load(self.emb_path)
-            if len(embeddings) != len(unique_df):
-                print("Embeddings mismatch. Recomputing...")
-                embeddings = None
-        else: embeddings = None
-
-        if embeddings is None:
-            print("Creating new embeddings...")
-            texts = unique_df["enriched_text"].tolist()
-            # Normalize embeddings for cosine similarity using FAISS
-            embeddings = self.sbert.encode(texts, batch_size=64, show_progress_bar=True, convert_to_numpy=True)
-            # Ensure type is float32 for FAISS
-            embeddings = embeddings.astype('float32')
-            # Normalize for Cosine Similarity
-            import faiss
-            faiss.normalize_L2(embeddings)
-            
-            np.save(self.emb_path, embeddings)
-        
         # Build FAISS Index (Much faster than KNN)
+        # Indexes are only reused if built from exactly the current embeddings
+        # with the same index type and build settings
         self.index_path = os.path.join(EMB_DIR, "faiss_index.bin")
         try:
             import faiss
-            if os.path.exists(self.index_path):
+            signature = ann_index.signature(self.index_type, self.index_params)
+            if self._index_is_fresh("faiss", self.index_path, signature):
                 print("Loading FAISS index...")
-                self.index = faiss.read_index(self.index_path)
-            else:
-                print("Building FAISS index...")
-                d = embeddings.shape[1]
-                self.index = faiss.IndexFlatIP(d) # Inner Product (Cosine Sim if normalized)
-                self.index.add(embeddings)
+                self.index = ann_index.configure_search(
+                    faiss.read_index(self.index_path),
+                    ann_index.resolve_params(self.index_type, self.index_params)
+                )
+            if self.index is None or self.index.ntotal != len(self.embeddings):
+                # Rebuilt from the stored vectors: no re-encoding
+                print(f"Building FAISS index ({self.index_type})...")
+                self.index = ann_index.build_index(self.embeddings, self.index_type, self.index_params)
                 faiss.write_index(self.index, self.index_path)
+                self._mark_index_fresh("faiss", signature)
         except ImportError:
             print("⚠️ FAISS not installed. Falling back to KNN.")
             # Fallback to KNN if FAISS missing
-            if os.path.exists(self.knn_path):
+            if self._index_is_fresh("knn", self.knn_path):
                  self.knn_index = joblib.load(self.knn_path)
             else:
                  self.knn_index = NearestNeighbors(n_neighbors=50, metric='cosine', algorithm='auto')
-                 self.knn_index.fit(embeddings)
+                 self.knn_index.fit(self.embeddings)
                  joblib.dump(self.knn_index, self.knn_path)
+                 self._mark_index_fresh("knn")
             self.index = None
 
-    def recommend(self, user_query, top_n_results=10, category_filter=None, min_sentiment_score=None, sort_by="relevance"):
-        # === CACHE CHECK ===
-        cache_key = hashlib.md5(f"{user_query}_{category_filter}_{min_sentiment_score}_{sort_by}".encode()).hexdigest()
-        
-        # Check if cached result exists and is still valid
-        if cache_key in self.query_cache:
-            result, timestamp = self.query_cache[cache_key]
-            if time.time() - timestamp < self.cache_ttl:
-                print(f"⚡ Cache HIT for query: '{user_query[:30]}...'")
-                return result
-        
-        # Clean old cache entries if cache is too large
-        if len(self.query_cache) > self.cache_max_size:
-            # Remove oldest entries
-            sorted_items = sorted(self.query_cache.items(), key=lambda x: x[1][1])
-            for key, _ in sorted_items[:20]:  # Remove 20 oldest
-                del self.query_cache[key]
-        
-        print(f"🔍 Processing query: '{user_query[:50]}...'")
-        
-        # 1. Analyze Query
-        query_aspects = self._infer_user_aspects(user_query)
-        user_comment_analysis = self._format_user_aspect_sentiment(query_aspects)
-        overall_sentiment = self._compute_overall_sentiment(user_comment_analysis)
-        
-        # 2. Semantic Search (Fetch more candidates to allow reranking)
-        query_emb = self.sbert.encode(user_query, convert_to_numpy=True).reshape(1, -1)
-        
-        cands_count = min(top_n_results * 3, len(self.item_ids))
-        
-        if hasattr(self, 'index') and self.index is not None:
+    def _encode_catalog(self, texts):
+        # Normalize embeddings for cosine similarity using FAISS
+        embeddings = self.sbert.encode(texts, batch_size=64, show_progress_bar=len(texts) > 1000, convert_to_numpy=True)
+        # Ensure type is float32 for FAISS
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # Normalize for Cosine Similarity
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    def _load_or_update_embeddings(self):
+        """
+        Embeddings for ``self.unique_df``, re-encoding only products whose
+        ``enriched_text`` (or id) is not in the manifest of the stored matrix.
+        """
+        ids = [content_hash(i) for i in self.item_ids]
+        hashes = [content_hash(t) for t in self.unique_df["enriched_text"]]
+        dim = self.sbert.get_sentence_embedding_dimension()
+
+        manifest = EmbeddingManifest.load(self.manifest_path)
+        old = None
+        if manifest is not None and os.path.exists(self.emb_path):
+            # Memory-mapped: pages are loaded lazily and shared between processes
+            old = np.load(self.emb_path, mmap_mode="r")
+            if (manifest.model_id != self.sbert_model_id or manifest.dim != dim or
+                    old.shape != (len(manifest.id_hashes), dim)):
+                print("Embeddings were built by a different model. Recomputing...")
+                old = None
+        elif os.path.exists(self.emb_path):
+            print("Embeddings have no manifest. Recomputing...")
+
+        if old is not None:
+            if manifest.id_hashes == ids and manifest.hashes == hashes:
+                self.manifest = manifest
+                if manifest.legacy:
+                    manifest.save(self.manifest_path)
+                return old
+            src, dst, stale = manifest.plan(ids, hashes)
+        else:
+            src = dst = np.zeros(0, dtype=np.int64)
+            stale = np.arange(len(ids))
+
+        print(f"Creating embeddings for {len(stale)} new/changed products (reusing {len(src)})...")
+        embeddings = np.empty((len(ids), dim), dtype=np.float32)
+        if len(src):
+            embeddings[dst] = old[src]
+        # Unmap before replacing the file: Windows refuses to replace a mapped file
+        del old
+        if len(stale):
+            texts = self.unique_df["enriched_text"].iloc[stale].tolist()
+            embeddings[stale] = self._encode_catalog(texts)
+
+        # Invalidate first: a crash between the two writes must not pair the
+        # new matrix with the old manifest
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        tmp_path = self.emb_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, embeddings)
+        os.replace(tmp_path, self.emb_path)
+        self.manifest = EmbeddingManifest(self.sbert_model_id, dim, ids, hashes)
+        self.manifest.save(self.manifest_path)
+        return np.load(self.emb_path, mmap_mode="r")
+
+    def _index_is_fresh(self, name, path, signature=""):
+        return os.path.exists(path) and self.manifest.indexes.get(name) == self.manifest.fingerprint + signature
+
+    def _mark_index_fresh(self, name, signature=""):
+        if self.manifest.indexes.get(name) == self.manifest.fingerprint + signature:
+            return
+        self.manifest.indexes[name] = self.manifest.fingerprint + signature
+        self.manifest.save(self.manifest_path)
+
+    def _retrieve(self, query_emb, k, allowed=None):
+        """
+        Top-k products for a (1, d) query embedding as (similarities, ids).
+
+        ``allowed`` is an optional boolean mask over products. Small allowed
+        sets are scored exactly against their embeddings; larger ones use a
+        FAISS IDSelector, falling back to over-fetching and filtering.
+        Products re-encoded since the index was built (see
+        ``_update_product_vector``) are skipped in the index and scored
+        exactly from the delta instead.
+        """
+        n = len(self.item_ids)
+        allowed_ids = None
+        if allowed is not None:
+            allowed_ids = np.flatnonzero(allowed)
+            if len(allowed_ids) == 0:
+                return np.zeros(0), np.zeros(0, dtype=np.int64)
+            if len(allowed_ids) == n:
+                allowed, allowed_ids = None, None
+        k = min(k, n if allowed_ids is None else len(allowed_ids))
+
+        query = query_emb[0].astype(np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        if allowed_ids is not None and len(allowed_ids) <= self.filtered_exact_limit:
+            sims = self._exact_scores(allowed_ids, query)
+            top = np.argpartition(-sims, k - 1)[:k] if k < len(sims) else np.arange(len(sims))
+            top = top[np.argsort(-sims[top], kind="stable")]
+            return sims[top].astype(np.float64), allowed_ids[top]
+
+        delta_ids, delta_vecs, stale = self.vector_delta
+        if not len(delta_ids):
+            return self._search_index(query_emb, k, allowed)
+
+        main_allowed = ~stale if allowed is None else allowed & ~stale
+        keep = np.ones(len(delta_ids), dtype=bool) if allowed is None else allowed[delta_ids]
+        sims, ids = self._search_index(query_emb, k, main_allowed)
+        sims = np.concatenate([sims, (delta_vecs[keep] @ query).astype(np.float64)])
+        ids = np.concatenate([ids, delta_ids[keep]])
+        top = np.argsort(-sims, kind="stable")[:k]
+        return sims[top], ids[top]
+
+    def _retrieve_many(self, query_embs, k):
+        """
+        Unfiltered top-k for each row of an (m, d) query batch, as a list of
+        (similarities, ids): one multi-row index search, then the feedback
+        delta merged per row exactly as ``_retrieve`` does.
+        """
+        n = len(self.item_ids)
+        k = min(k, n)
+        queries = np.ascontiguousarray(query_embs, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        delta_ids, delta_vecs, stale = self.vector_delta
+        # Stale rows dropped from the index hits still leave k
+        fetch = min(n, k + len(delta_ids))
+        if self.index is not None:
+            distances, indices = self.index.search(queries, fetch)
+        else:
+            distances, indices = self.knn_index.kneighbors(queries, n_neighbors=fetch)
+            distances = 1 - distances
+
+        hits = []
+        for row, query in enumerate(queries):
+            if not len(delta_ids):
+                sims, ids = self._valid_hits(distances[row], indices[row])
+                hits.append((sims[:k], ids[:k]))
+                continue
+            sims, ids = self._valid_hits(distances[row], indices[row], ~stale)
+            sims = np.concatenate([sims, (delta_vecs @ query).astype(np.float64)])
+            ids = np.concatenate([ids, delta_ids])
+            top = np.argsort(-sims, kind="stable")[:k]
+            hits.append((sims[top], ids[top]))
+        return hits
+
+    def _search_index(self, query_emb, k, allowed=None):
+        n = len(self.item_ids)
+        allowed_ids = None if allowed is None else np.flatnonzero(allowed)
+        if allowed_ids is not None:
+            if len(allowed_ids) == 0:
+                return np.zeros(0), np.zeros(0, dtype=np.int64)
+            k = min(k, len(allowed_ids))
+
+        if self.index is not None:
             import faiss
             # Normalize query for Cosine Similarity (Inner Product)
             faiss.normalize_L2(query_emb)
-            distances, indices = self.index.search(query_emb, cands_count)
-            is_faiss = True
+            # Selectors cost O(#allowed) to build; masks that keep most of the
+            # catalog (e.g. only feedback-stale ids removed) over-fetch instead
+            # IVF / HNSW may return a short page for a selective filter: retry
+            # with a wider nprobe / efSearch, then fall back to over-fetching
+            if allowed_ids is not None and len(allowed_ids) <= n // 2:
+                try:
+                    selector = faiss.IDSelectorBatch(allowed_ids.astype(np.int64))
+                    for widen in (1, 4, 16):
+                        params = ann_index.search_params(self.index, selector, widen)
+                        distances, indices = self.index.search(query_emb, k, params=params)
+                        sims, ids = self._valid_hits(distances[0], indices[0], allowed)
+                        if len(ids) >= k or not ann_index.is_approximate(self.index):
+                            return sims, ids
+                except (AttributeError, TypeError, RuntimeError):
+                    pass  # older FAISS / index type without selector support
+            search = lambda fetch: self.index.search(query_emb, fetch)
         else:
-            distances, indices = self.knn_index.kneighbors(query_emb, n_neighbors=cands_count)
-            is_faiss = False
+            def search(fetch):
+                distances, indices = self.knn_index.kneighbors(query_emb, n_neighbors=fetch)
+                return 1 - distances, indices
+
+        # Adaptive over-fetch: scale by the filter's selectivity, grow until full
+        fetch = k if allowed_ids is None else min(n, int(k * n / len(allowed_ids) * 1.5) + 1)
+        while True:
+            distances, indices = search(fetch)
+            sims, ids = self._valid_hits(distances[0], indices[0], allowed)
+            if len(ids) >= k or fetch >= n:
+                return sims[:k], ids[:k]
+            fetch = min(n, fetch * 4)
+
+    def _exact_scores(self, ids, query, chunk_size=4096):
+        """Similarity of ``query`` to each of ``ids``, a chunk of rows at a time (no full copy)."""
+        sims = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), chunk_size):
+            sims[start:start + chunk_size] = self._vectors(ids[start:start + chunk_size]) @ query
+        return sims
+
+    def _vectors(self, ids):
+        """Current embeddings of ``ids`` (sorted positions), feedback re-embeddings applied."""
+        rows = np.array(self.embeddings[ids], dtype=np.float32)
+        override_ids, override_vecs = self.vector_overrides
+        if len(override_ids):
+            at = np.searchsorted(override_ids, ids).clip(max=len(override_ids) - 1)
+            hit = override_ids[at] == ids
+            rows[hit] = override_vecs[at[hit]]
+        return rows
 
-        candidates = []
+    @staticmethod
+    def _upsert_vector(ids, vecs, pos, vector):
+        """Copies of sorted ``ids`` / ``vecs`` with ``pos`` set to ``vector``, and whether it was new."""
+        at = np.searchsorted(ids, pos)
+        if at < len(ids) and ids[at] == pos:
+            vecs = vecs.copy()
+            vecs[at] = vector
+            return ids, vecs, False
+        return np.insert(ids, at, pos), np.insert(vecs, at, vector, axis=0), True
+
+    def _update_product_vector(self, pos, text):
+        """
+        Re-embed one product whose ``enriched_text`` changed to ``text``. The
+        new vector goes into a small delta merged at query time, folded into
+        the index once ``vector_merge_threshold`` are pending; the stored
+        matrix and index pick the change up on the next start via the
+        manifest (re-encoding just the changed rows). Cached results that
+        contain the product are dropped, the rest expire within
+        ``feedback_cache_grace`` seconds.
+        """
+        vector = np.asarray(self._encode([text]), dtype=np.float32).reshape(-1)
+        vector = vector / max(np.linalg.norm(vector), 1e-12)
+        with self.vector_lock:
+            # A newer feedback for the same product may have finished first
+            if self.unique_df["enriched_text"].iat[pos] != text:
+                return
+            delta_ids, delta_vecs, stale = self.vector_delta
+            delta_ids, delta_vecs, added = self._upsert_vector(delta_ids, delta_vecs, pos, vector)
+            if added:
+                stale = stale.copy()
+                stale[pos] = True
+            # Swapped as one tuple so readers never see a half-updated delta
+            self.vector_delta = (delta_ids, delta_vecs, stale)
+            self.vector_overrides = self._upsert_vector(*self.vector_overrides, pos, vector)[:2]
+            merge = (
+                self.index is not None and len(delta_ids) >= self.vector_merge_threshold
+                and not self.vector_merging
+            )
+            if merge:
+                self.vector_merging = True
+        if merge:
+            threading.Thread(target=self._merge_vector_delta, daemon=True).start()
+        # Cached results showing this product are wrong now; ones it may newly
+        # enter are served for at most the grace period
+        product_id = str(self.item_ids[pos])
+        self.query_cache.invalidate(lambda result: any(str(rec["id"]) == product_id for rec in result["raw_recs"]))
+        self.query_cache.expire_within(self.feedback_cache_grace)
+
+    def _merge_vector_delta(self):
+        """
+        Fold the pending feedback vectors into the index (a re-fill of a copy
+        that keeps the IVF / PQ training), so queries stop paying for the
+        delta. Vectors re-encoded while this runs stay in the delta.
+        """
+        try:
+            started = time.time()
+            delta_ids, delta_vecs, _ = self.vector_delta
+            vectors = self._vectors(np.arange(len(self.item_ids)))
+            index = ann_index.rebuild(self.index, vectors)
+            with self.vector_lock:
+                current_ids, current_vecs, stale = self.vector_delta
+                # Rows updated again since the snapshot differ from the index
+                at = np.searchsorted(delta_ids, current_ids).clip(max=max(len(delta_ids) - 1, 0))
+                folded = (delta_ids[at] == current_ids) if len(delta_ids) else np.zeros(len(current_ids), dtype=bool)
+                folded[folded] = (delta_vecs[at[folded]] == current_vecs[folded]).all(axis=1)
+                stale = stale.copy()
+                stale[current_ids[folded]] = False
+                # Index first: searches read the delta before the index, so a
+                # search seeing the smaller delta always gets the new index
+                self.index = index
+                self.vector_delta = (current_ids[~folded], current_vecs[~folded], stale)
+            print(f"✅ Folded {int(folded.sum())} feedback vectors into the index ({(time.time() - started) * 1000:.0f}ms)")
+        except Exception as e:
+            print(f"⚠️ Failed to fold feedback vectors into the index: {e}")
+        finally:
+            with self.vector_lock:
+                self.vector_merging = False
+
+    def _valid_hits(self, distances, indices, allowed=None):
+        ids = indices.astype(np.int64)
+        # FAISS pads with -1 when it has fewer than k hits
+        valid = (ids >= 0) & (ids < len(self.item_ids))
+        if allowed is not None:
+            valid[valid] &= allowed[ids[valid]]
+        return distances[valid].astype(np.float64), ids[valid]
+
+    def _text_for_ce(self, pos):
+        row = self.products.row(pos)
+        return str(row["itemName"]) + " " + str(row.get("description", ""))[:200]  # Limit text length for speed
+
+    def _recommend_key(self, user_query, top_n_results, category_filter, min_sentiment_score, sort_by):
+        # Key on the normalized query so case/whitespace variants share an entry
+        return (
+            normalize_query(user_query),
+            str(category_filter).lower() if category_filter else None,
+            min_sentiment_score,
+            sort_by,
+            top_n_results
+        )
+
+    def _allowed_mask(self, category_filter=None, min_sentiment_score=None):
+        """Boolean mask of products passing the filters, or None for no filter."""
+        allowed = None
+        if category_filter:
+            allowed = self.products.filter_codes == self.products.category_filter_code(category_filter)
+        if min_sentiment_score is not None:
+            sentiment_ok = self.aspects.sentiment_scores >= min_sentiment_score
+            allowed = sentiment_ok if allowed is None else allowed & sentiment_ok
+        return allowed
+
+    def _boost_candidates(self, query_aspects, base_scores, idx):
+        """Semantic score + aspect boost for retrieved candidates, and their initial order."""
         query_aspect_names = set(qa[0] for qa in query_aspects)
+        query_codes = self.aspects.lookup_codes(query_aspect_names)
+        pos_hits, neg_hits = self.aspects.match_counts(idx, query_codes)
+        scores = base_scores + 0.15 * pos_hits - 0.05 * neg_hits
+        return {
+            "idx": idx,
+            "scores": scores,
+            "order": np.argsort(-scores, kind="stable"),
+            "sentiment_scores": self.aspects.sentiment_scores[idx],
+            "pos_hits": pos_hits,
+            "neg_hits": neg_hits,
+            "query_aspect_names": query_aspect_names
+        }
 
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx >= len(self.item_ids): continue
-            item_id = self.item_ids[idx]
-            row = self.unique_df[self.unique_df["item_unique_id"] == item_id].iloc[0]
-            
-            # Apply category filter
-            if category_filter and str(row["category"]).lower() != category_filter.lower():
-                continue
-            
-            try: aspects = json.loads(row["aspects_sentiments"])
-            except: aspects = {}
+    def _rerank_pairs(self, user_query, cands):
+        """Cross-encoder inputs for the candidates worth reranking."""
+        # ⚡ SPEED OPTIMIZATION: Only rerank top 30 candidates instead of all
+        top = cands["order"][:30]
+        return top, [[user_query, self._text_for_ce(cands["idx"][i])] for i in top]
 
-            # 3. Calculate Boost
-            boost = 0.0
-            for qa_name in query_aspect_names:
-                if qa_name in aspects:
-                    attr = aspects[qa_name]
-                    if attr.get("sentiment") == "Positive":
-                        boost += 0.15
-                    elif attr.get("sentiment") == "Negative":
-                        boost -= 0.05
-            
-            # Calculate sentiment score for filtering
-            pos_count = sum(1 for v in aspects.values() if v.get("sentiment") == "Positive")
-            neg_count = sum(1 for v in aspects.values() if v.get("sentiment") == "Negative")
-            total_aspects = len(aspects) if len(aspects) > 0 else 1
-            sentiment_score = (pos_count - neg_count) / total_aspects
-            
-            # Apply sentiment filter
-            if min_sentiment_score is not None and sentiment_score < min_sentiment_score:
-                continue
-            
-            # Base semantic score + boost
-            if is_faiss:
-                final_score = float(dist) + boost
-            else:
-                final_score = float(1 - dist) + boost
+    def _apply_rerank(self, cands, top, ce_scores):
+        # Normalize CE scores roughly to 0-1 for safer boosting, then re-apply aspect boost
+        ce_scores = np.asarray(ce_scores, dtype=np.float64)
+        rerank_boost = 0.1 * cands["pos_hits"][top] - 0.1 * cands["neg_hits"][top]
+        cands["scores"][top] = 1 / (1 + np.exp(-ce_scores)) + rerank_boost
 
-            candidates.append({
-                "id": item_id,
+    def _select_results(self, cands, sort_by, top_n_results):
+        """Sort the candidates (stable, from the initial ranking) and hydrate the top N."""
+        idx, scores, order = cands["idx"], cands["scores"], cands["order"]
+        sentiment_scores = cands["sentiment_scores"]
+        if sort_by == "sentiment":
+            order = order[np.argsort(-sentiment_scores[order], kind="stable")]
+        elif sort_by == "name":
+            names = self.products.frame["itemName"].to_numpy()
+            order = np.array(sorted(order, key=lambda i: str(names[idx[i]]).lower()), dtype=np.int64)
+        else:  # default: relevance
+            order = order[np.argsort(-scores[order], kind="stable")]
+            
+        final_recs = []
+        for i in order[:top_n_results]:
+            pos = int(idx[i])
+            row = self.products.row(pos)
+            final_recs.append({
+                "id": self.item_ids[pos],
                 "name": row["itemName"],
                 "category": row["category"],
                 "image": str(row["image"]) if pd.notna(row.get("image")) else "",
                 "description": str(row.get("description", "")),
                 "feature": str(row.get("feature", "")),
-                "score": final_score,
-                "sentiment_score": sentiment_score,
-                "aspects": aspects,
+                "score": float(scores[i]),
+                "sentiment_score": float(sentiment_scores[i]),
+                "aspects": self.aspects.get(pos),
                 "row_ref": row,
-                "text_for_ce": str(row["itemName"]) + " " + str(row.get("description", ""))[:200]  # Limit text length for speed
+                "text_for_ce": self._text_for_ce(pos)
             })
+        return final_recs
 
-        # 4. Re-Ranking with Cross-Encoder (Accuracy Boost)
-        # ⚡ SPEED OPTIMIZATION: Only rerank top 30 candidates instead of all
-        if candidates:
-            # Sort by initial score and take top 30 for cross-encoder reranking
-            candidates.sort(key=lambda x: x["score"], reverse=True)
-            top_candidates_for_rerank = candidates[:min(30, len(candidates))]
-            
-            ce_pairs = [[user_query, c["text_for_ce"]] for c in top_candidates_for_rerank]
-            ce_scores = self.cross_encoder.predict(ce_pairs)
-            
-            # Normalize CE scores roughly to 0-1 for safer boosting
-            import math
-            def sigmoid(x): return 1 / (1 + math.exp(-x))
-            
-            for i, c in enumerate(top_candidates_for_rerank):
-                base_score = sigmoid(ce_scores[i])
-                
-                # Re-apply aspect boost
-                boost = 0.0
-                query_aspect_names = set(qa[0] for qa in query_aspects)
-                for qa_name in query_aspect_names:
-                    if qa_name in c["aspects"]:
-                        attr = c["aspects"][qa_name]
-                        if attr.get("sentiment") == "Positive":
-                            boost += 0.1
-                        elif attr.get("sentiment") == "Negative":
-                            boost -= 0.1
-
-                c["score"] = base_score + boost
-
-        # 5. Sort based on sort_by parameter
-        if sort_by == "sentiment":
-            candidates.sort(key=lambda x: x["sentiment_score"], reverse=True)
-        elif sort_by == "name":
-            candidates.sort(key=lambda x: x["name"].lower())
-        else:  # default: relevance
-            candidates.sort(key=lambda x: x["score"], reverse=True)
-            
-        final_recs = candidates[:top_n_results]
-
-        # 5. Enrich Top-N (Fallback for UI) & Build Explanations
-        results = []
+    def _needs_fallback(self, final_recs):
+        """(id, row) of results lacking a positive or a negative aspect."""
+        needs_fallback = []
         for rec in final_recs:
             aspects = rec["aspects"]
-            row = rec["row_ref"]
-            
-            # --- FALLBACK EXTRACTION (Optimized: Only runs on Top N) ---
             has_pos = any(v.get("sentiment") == "Positive" for v in aspects.values())
             has_neg = any(v.get("sentiment") == "Negative" for v in aspects.values())
-
             if not has_pos or not has_neg:
-                context_text = str(row.get("reviewText", ""))
-                if len(context_text) < 20: 
-                    context_text = f"{row['itemName']} {row['category']} {row['description']}"
-                
-                # Run on-the-fly extraction 
-                fresh_aspects = self._extract_multi_aspects_single(context_text[:1000], threshold=0.1)
-                for k, v in fresh_aspects.items():
-                    if k not in aspects: aspects[k] = v
-            # -----------------------------------------------------------
-            
-            # Separate Pos and Neg
-            pos_list = []
-            neg_list = []
-            
-            for a, v in aspects.items():
-                s = v.get("sentiment", "Neutral")
-                c = v.get("confidence", 0)
-                if s == "Positive":
-                    pos_list.append({"name": a, "score": c})
-                elif s == "Negative":
-                    neg_list.append({"name": a, "score": c})
-            
-            # Sort by confidence
-            pos_list.sort(key=lambda x: x["score"], reverse=True)
-            neg_list.sort(key=lambda x: x["score"], reverse=True)
-            
-            top_4_pos = pos_list[:4]
-            top_2_neg = neg_list[:2]
-            
-            # Matched reasons
-            matched = [a for a in query_aspect_names if a in aspects and aspects[a].get("sentiment") == "Positive"]
-            
-            results.append({
-                "product": rec["name"],
-                "matched_aspects": matched,
-                "top_pos_aspects": top_4_pos,
-                "top_neg_aspects": top_2_neg,
-                "reason": f"Winner for: {', '.join(matched)}" if matched else "Highly recommended.",
-                "all_aspects": aspects 
-            })
+                needs_fallback.append((rec["id"], rec["row_ref"]))
+        return needs_fallback
+
+    def _explain_result(self, rec, fallback, query_aspect_names):
+        """UI explanation of one result; merges its fallback aspects into ``rec``."""
+        aspects = rec["aspects"]
+        for k, v in (fallback.get(rec["id"]) or {}).items():
+            if k not in aspects: aspects[k] = v
+        
+        # Separate Pos and Neg
+        pos_list = []
+        neg_list = []
+        
+        for a, v in aspects.items():
+            s = v.get("sentiment", "Neutral")
+            c = v.get("confidence", 0)
+            if s == "Positive":
+                pos_list.append({"name": a, "score": c})
+            elif s == "Negative":
+                neg_list.append({"name": a, "score": c})
+        
+        # Sort by confidence
+        pos_list.sort(key=lambda x: x["score"], reverse=True)
+        neg_list.sort(key=lambda x: x["score"], reverse=True)
+        
+        top_4_pos = pos_list[:4]
+        top_2_neg = neg_list[:2]
+        
+        # Matched reasons
+        matched = [a for a in query_aspect_names if a in aspects and aspects[a].get("sentiment") == "Positive"]
+        
+        return {
+            "product": rec["name"],
+            "matched_aspects": matched,
+            "top_pos_aspects": top_4_pos,
+            "top_neg_aspects": top_2_neg,
+            "reason": f"Winner for: {', '.join(matched)}" if matched else "Highly recommended.",
+            "all_aspects": aspects 
+        }
+
+    @staticmethod
+    def _stages_used(absa_ready, rerank_ready):
+        """``pipeline_stages`` of a response, from the readiness captured when its request started."""
+        return ["retrieval"] + (["absa"] if absa_ready else []) + (["rerank"] if rerank_ready else [])
+
+    def _explain_results(self, final_recs, fallback, query_aspect_names, user_comment_analysis, overall_sentiment, stages):
+        results = [self._explain_result(rec, fallback, query_aspect_names) for rec in final_recs]
 
         # Clean up internal refs before returning
         for rec in final_recs:
@@ -521,31 +1103,341 @@ class ProductRecommender:
         # Get available categories for filtering
         available_categories = sorted(list(set(self.unique_df["category"].astype(str).unique())))
 
-        result = self._sanitize_for_json({
+        return {
             "query_analysis": user_comment_analysis,
             "overall_sentiment": overall_sentiment,
             "results": results,
             "raw_recs": final_recs,
-            "available_categories": available_categories
-        })
+            "available_categories": available_categories,
+            "pipeline_stages": stages
+        }
+
+    def recommend(self, user_query, top_n_results=10, category_filter=None, min_sentiment_score=None, sort_by="relevance", debug=False):
+        # Stage laps feed recommender_stage_seconds; debug=True also returns them as "timings_ms"
+        timer = StageTimer(self.metrics, "recommender_stage_seconds", "recommend")
+
+        # === CACHE CHECK ===
+        cache_key = self._recommend_key(user_query, top_n_results, category_filter, min_sentiment_score, sort_by)
+        result = self.query_cache.get(cache_key)
+        timer.lap("cache_lookup")
+        if result is not None:
+            print(f"⚡ Cache HIT for query: '{user_query[:30]}...'")
+            self.metrics.observe("recommender_operation_seconds", timer.total(), operation="recommend", cache="hit")
+            return {**result, "timings_ms": timer.timings_ms()} if debug else result
+        
+        print(f"🔍 Processing query: '{user_query[:50]}...'")
+
+        # Stages still loading (staged startup) are skipped, not waited for
+        absa_ready = self.stages["absa"]
+        rerank_ready = self.stages["rerank"]
+        
+        # 1. Analyze Query
+        query_aspects = self._infer_user_aspects(user_query) if absa_ready else []
+        user_comment_analysis = self._format_user_aspect_sentiment(query_aspects)
+        overall_sentiment = self._compute_overall_sentiment(user_comment_analysis)
+        timer.lap("query_absa")
+        
+        # 2. Semantic Search (Fetch more candidates to allow reranking)
+        query_emb = np.asarray(self._encode([user_query]), dtype=np.float32).reshape(1, -1)
+        timer.lap("encode")
+        
+        # Filters are pushed down into retrieval so narrow ones still fill a page
+        allowed = self._allowed_mask(category_filter, min_sentiment_score)
+        cands_count = top_n_results * self.candidate_pool_factor
+        base_scores, idx = self._retrieve(query_emb, cands_count, allowed)
+        timer.lap("retrieve")
+
+        # 3. Base semantic score + aspect boost
+        cands = self._boost_candidates(query_aspects, base_scores, idx)
+        timer.lap("aspect_boost")
+
+        # 4. Re-Ranking with Cross-Encoder (Accuracy Boost)
+        if rerank_ready and len(cands["order"]):
+            top, ce_pairs = self._rerank_pairs(user_query, cands)
+            self._apply_rerank(cands, top, self._predict_ce(ce_pairs))
+            timer.lap("rerank")
+
+        # 5. Sort based on sort_by parameter
+        final_recs = self._select_results(cands, sort_by, top_n_results)
+        timer.lap("hydrate")
+
+        # 5. Enrich Top-N (Fallback for UI) & Build Explanations
+        # --- FALLBACK EXTRACTION (Only runs on Top N, batched + cached) ---
+        needs_fallback = self._needs_fallback(final_recs)
+        fallback = self._fallback_aspects(needs_fallback) if needs_fallback and absa_ready else {}
+        timer.lap("fallback_absa")
+        # -----------------------------------------------------------------
+
+        result = self._explain_results(
+            final_recs, fallback, cands["query_aspect_names"], user_comment_analysis, overall_sentiment,
+            self._stages_used(absa_ready, rerank_ready)
+        )
+        timer.lap("explain")
+        result = self._sanitize_for_json(result)
+        timer.lap("sanitize")
         
         # === CACHE RESULT ===
-        self.query_cache[cache_key] = (result, time.time())
+        # Degraded (partially loaded) results must not outlive the loading phase
+        if absa_ready and rerank_ready:
+            self.query_cache.put(cache_key, result)
+        self.metrics.observe("recommender_operation_seconds", timer.total(), operation="recommend", cache="miss")
         
-        return result
+        return {**result, "timings_ms": timer.timings_ms()} if debug else result
+
+    def recommend_stream(self, user_query, top_n_results=10, category_filter=None, min_sentiment_score=None, sort_by="relevance"):
+        """
+        ``recommend`` as a generator of progressively better responses, so
+        a client can render before the expensive stages finish:
+
+        - ``{"stage": "retrieval", "response"}``: index ranking with the
+          stored aspects (only SBERT runs before it);
+        - ``{"stage": "rerank", "response"}``: the final order after query
+          ABSA, aspect boost and cross-encoder, with the query analysis;
+          ``"skipped": True`` when the cross-encoder isn't loaded yet (the
+          order then reflects the aspect boost only);
+        - ``{"stage": "explanation", "index", "result", "raw_rec"}``: one per
+          result whose fallback ABSA was still pending, top result first;
+        - ``{"stage": "done", "response"}``: the complete response, the
+          same as ``recommend`` returns (and cached like it).
+
+        A cached query yields only "done". Responses have recommend()'s shape.
+        """
+        timer = StageTimer(self.metrics, "recommender_stage_seconds", "recommend_stream")
+        cache_key = self._recommend_key(user_query, top_n_results, category_filter, min_sentiment_score, sort_by)
+        result = self.query_cache.get(cache_key)
+        timer.lap("cache_lookup")
+        if result is not None:
+            yield {"stage": "done", "response": result}
+            return
+
+        print(f"🔍 Streaming query: '{user_query[:50]}...'")
+        absa_ready = self.stages["absa"]
+        rerank_ready = self.stages["rerank"]
+
+        # 1. Retrieval only: semantic order, stored aspects
+        query_emb = np.asarray(self._encode([user_query]), dtype=np.float32).reshape(1, -1)
+        timer.lap("encode")
+        allowed = self._allowed_mask(category_filter, min_sentiment_score)
+        base_scores, idx = self._retrieve(query_emb, top_n_results * self.candidate_pool_factor, allowed)
+        timer.lap("retrieve")
+        preview = self._select_results(self._boost_candidates([], base_scores, idx), sort_by, top_n_results)
+        no_analysis = self._format_user_aspect_sentiment([])
+        yield {"stage": "retrieval", "response": self._sanitize_for_json(self._explain_results(
+            preview, {}, set(), no_analysis, self._compute_overall_sentiment(no_analysis), ["retrieval"]
+        ))}
+
+        # 2. Query aspects, aspect boost and cross-encoder: the final order
+        timer.last = time.perf_counter()  # time spent by the client is not a stage
+        query_aspects = self._infer_user_aspects(user_query) if absa_ready else []
+        user_comment_analysis = self._format_user_aspect_sentiment(query_aspects)
+        overall_sentiment = self._compute_overall_sentiment(user_comment_analysis)
+        timer.lap("query_absa")
+        cands = self._boost_candidates(query_aspects, base_scores, idx)
+        if rerank_ready and len(cands["order"]):
+            top, ce_pairs = self._rerank_pairs(user_query, cands)
+            self._apply_rerank(cands, top, self._predict_ce(ce_pairs))
+            timer.lap("rerank")
+        final_recs = self._select_results(cands, sort_by, top_n_results)
+        needs_fallback = self._needs_fallback(final_recs) if absa_ready else []
+        query_aspect_names = cands["query_aspect_names"]
+        stages = self._stages_used(absa_ready, rerank_ready)
+        ranked = self._explain_results(final_recs, {}, query_aspect_names, user_comment_analysis, overall_sentiment, stages)
+        timer.lap("hydrate")
+        event = {"stage": "rerank", "response": self._sanitize_for_json(ranked)}
+        if not rerank_ready:
+            event["skipped"] = True
+        yield event
+
+        # 3. Fallback ABSA one result at a time, in rank order
+        fallback = {}
+        positions = {rec["id"]: i for i, rec in enumerate(final_recs)}
+        for product_id, row in needs_fallback:
+            timer.last = time.perf_counter()
+            fallback.update(self._fallback_aspects([(product_id, row)]))
+            timer.lap("fallback_absa")
+            rec = final_recs[positions[product_id]]
+            yield {
+                "stage": "explanation",
+                "index": positions[product_id],
+                "result": self._sanitize_for_json(self._explain_result(rec, fallback, query_aspect_names)),
+                "raw_rec": self._sanitize_for_json(rec)
+            }
+
+        result = self._sanitize_for_json(self._explain_results(
+            final_recs, fallback, query_aspect_names, user_comment_analysis, overall_sentiment, stages
+        ))
+        if absa_ready and rerank_ready:
+            self.query_cache.put(cache_key, result)
+        yield {"stage": "done", "response": result}
+
+    def recommend_batch(self, requests, debug=False):
+        """
+        ``recommend`` for many queries in one call, results in input order.
+
+        Each request is a dict with ``query`` and optionally recommend()'s
+        ``top_n_results`` / ``category_filter`` / ``min_sentiment_score`` /
+        ``sort_by``. Cached and repeated queries are answered once; the rest
+        share one spaCy + ABSA pass for query aspects, one SBERT encode, one
+        multi-row index search (filtered queries are retrieved one by one,
+        as in ``recommend``), one cross-encoder call and one fallback ABSA
+        call, so throughput grows with the batch size.
+        """
+        timer = StageTimer(self.metrics, "recommender_stage_seconds", "recommend_batch")
+        specs = []
+        for req in requests:
+            spec = {
+                "query": str(req["query"]),
+                "top_n_results": int(req.get("top_n_results", 10)),
+                "category_filter": req.get("category_filter"),
+                "min_sentiment_score": req.get("min_sentiment_score"),
+                "sort_by": req.get("sort_by") or "relevance"
+            }
+            spec["key"] = self._recommend_key(
+                spec["query"], spec["top_n_results"], spec["category_filter"], spec["min_sentiment_score"], spec["sort_by"]
+            )
+            specs.append(spec)
+
+        # === CACHE CHECK === (and duplicates within the batch run once)
+        answers, todo, queued = {}, [], set()
+        for spec in specs:
+            key = spec["key"]
+            if key in answers or key in queued:
+                continue
+            result = self.query_cache.get(key)
+            if result is not None:
+                answers[key] = result
+            else:
+                todo.append(spec)
+                queued.add(key)
+        timer.lap("cache_lookup")
+        print(f"🔍 Processing batch of {len(specs)} queries ({len(todo)} uncached)...")
+
+        if todo:
+            absa_ready = self.stages["absa"]
+            rerank_ready = self.stages["rerank"]
+            queries = [spec["query"] for spec in todo]
+
+            # 1. Query aspects for all queries at once
+            all_aspects = self._infer_user_aspects_many(queries) if absa_ready else [[] for _ in todo]
+            timer.lap("query_absa")
+
+            # 2. One encode, one multi-row search for the unfiltered queries
+            query_embs = np.asarray(self._encode(queries), dtype=np.float32).reshape(len(todo), -1)
+            timer.lap("encode")
+            retrieved = [None] * len(todo)
+            unfiltered = {}  # k -> rows; one search per page size keeps ties ordered as in recommend()
+            for i, spec in enumerate(todo):
+                allowed = self._allowed_mask(spec["category_filter"], spec["min_sentiment_score"])
+                k = spec["top_n_results"] * self.candidate_pool_factor
+                if allowed is None:
+                    unfiltered.setdefault(k, []).append(i)
+                else:
+                    retrieved[i] = self._retrieve(query_embs[i:i + 1].copy(), k, allowed)
+            for k, rows in unfiltered.items():
+                for i, hits in zip(rows, self._retrieve_many(query_embs[rows], k)):
+                    retrieved[i] = hits
+            timer.lap("retrieve")
+
+            # 3. Aspect boost per query
+            cands = [
+                self._boost_candidates(aspects, base_scores, idx)
+                for aspects, (base_scores, idx) in zip(all_aspects, retrieved)
+            ]
+            timer.lap("aspect_boost")
+
+            # 4. One cross-encoder call over every query's rerank pairs
+            if rerank_ready:
+                reranks = [self._rerank_pairs(spec["query"], c) if len(c["order"]) else (None, []) for spec, c in zip(todo, cands)]
+                pooled = [pair for _, pairs in reranks for pair in pairs]
+                ce_scores = np.asarray(self._predict_ce(pooled), dtype=np.float64) if pooled else np.zeros(0)
+                offset = 0
+                for c, (top, pairs) in zip(cands, reranks):
+                    if pairs:
+                        self._apply_rerank(c, top, ce_scores[offset:offset + len(pairs)])
+                        offset += len(pairs)
+                timer.lap("rerank")
+
+            final = [self._select_results(c, spec["sort_by"], spec["top_n_results"]) for spec, c in zip(todo, cands)]
+            timer.lap("hydrate")
+
+            # 5. One fallback ABSA call for all results that need it
+            needs_fallback = [item for recs in final for item in self._needs_fallback(recs)]
+            fallback = self._fallback_aspects(needs_fallback) if needs_fallback and absa_ready else {}
+            timer.lap("fallback_absa")
+
+            for spec, c, final_recs, aspects in zip(todo, cands, final, all_aspects):
+                user_comment_analysis = self._format_user_aspect_sentiment(aspects)
+                overall_sentiment = self._compute_overall_sentiment(user_comment_analysis)
+                result = self._sanitize_for_json(self._explain_results(
+                    final_recs, fallback, c["query_aspect_names"], user_comment_analysis, overall_sentiment,
+                    self._stages_used(absa_ready, rerank_ready)
+                ))
+                answers[spec["key"]] = result
+                # Degraded (partially loaded) results must not outlive the loading phase
+                if absa_ready and rerank_ready:
+                    self.query_cache.put(spec["key"], result)
+            timer.lap("explain")
+
+        self.metrics.observe("recommender_operation_seconds", timer.total(), operation="recommend_batch", cache="none")
+        batch = {"results": [answers[spec["key"]] for spec in specs]}
+        if debug:
+            batch["timings_ms"] = timer.timings_ms()
+        return batch
     
     
+    def cache_stats(self):
+        return {
+            "results": self.query_cache.stats(),
+            "fallback_aspects": self.fallback_cache.stats(),
+            "absa_pairs": self.absa_cache.stats() if self.absa_cache else None,
+            "aspect_chunks": self.aspect_extractor.cache.stats() if self.stages["absa"] else None,
+            "query_aspects": self.query_aspect_cache.stats()
+        }
+
+    def metric_samples(self):
+        """Gauges / counters for GET /metrics, sampled from the components' stats()."""
+        samples = [
+            ("recommender_stage_ready", "gauge", "Whether a pipeline stage has loaded", {"stage": stage}, int(ready))
+            for stage, ready in self.stages.items()
+        ]
+        for name, stats in self.cache_stats().items():
+            if not stats:
+                continue
+            labels = {"cache": name}
+            lookups = stats["hits"] + stats["misses"]
+            samples += [
+                ("cache_entries", "gauge", "Entries held per cache", labels, stats["entries"]),
+                ("cache_hits_total", "counter", "Cache hits", labels, stats["hits"]),
+                ("cache_misses_total", "counter", "Cache misses", labels, stats["misses"]),
+                ("cache_hit_ratio", "gauge", "Cache hits / lookups", labels, stats["hits"] / lookups if lookups else 0.0),
+            ]
+        for name, batcher in self.batchers.items():
+            stats = batcher.stats()
+            labels = {"model": name}
+            samples += [
+                ("inference_batcher_queue_depth", "gauge", "Requests waiting for a micro-batch", labels, stats["queue_depth"]),
+                ("inference_batcher_mean_batch_size", "gauge", "Mean inputs per micro-batch", labels, stats["mean_batch_size"]),
+            ]
+        writer = self.feedback_writer.stats()
+        samples += [
+            ("feedback_queue_depth", "gauge", "Feedback records waiting to be logged", {}, writer["queue_depth"]),
+            ("feedback_records_written_total", "counter", "Feedback records appended to the log", {}, writer["records_written"]),
+            ("feedback_full_queue_waits_total", "counter", "Feedback submits that blocked on a full queue", {}, writer["full_queue_waits"]),
+            ("feedback_last_flush_seconds", "gauge", "Duration of the last feedback log flush", {}, writer["last_flush_ms"] / 1000),
+        ]
+        return samples
+
     def add_feedback(self, product_id, feedback_text):
-        start_time = time.time()
+        self._require_absa()
+        timer = StageTimer(self.metrics, "recommender_stage_seconds", "add_feedback")
         
         # Optimize: Limit to 3 aspects max and use higher threshold for speed
-        t1 = time.time()
         new_aspects = self._extract_multi_aspects_single(
             feedback_text, 
             threshold=0.7,  # Higher threshold = fewer, more confident aspects = faster
             max_aspects=3   # Limit to 3 aspects max for speed
         )
-        absa_time = (time.time() - t1) * 1000
+        absa_time = timer.lap("absa") * 1000
         print(f"⏱️  ABSA analysis took: {absa_time:.0f}ms")
         
         if not new_aspects: 
@@ -555,80 +1447,59 @@ class ProductRecommender:
                 "feedback_analysis": {}
             }
 
-        mask = self.unique_df["item_unique_id"] == product_id
-        if not mask.any(): return {"status": "error", "message": "Product not found"}
+        pos = self.products.position(product_id)
+        if pos is None: return {"status": "error", "message": "Product not found"}
         
-        idx = self.unique_df.index[mask][0]
-        current_data = self.unique_df.at[idx, "aspects_sentiments"]
-        try: current_aspects = json.loads(current_data)
-        except: current_aspects = {}
-        
-        # Merge new aspects (simple overwrite/update for now)
-        for k, v in new_aspects.items(): 
-            current_aspects[k] = v
-            
         # Update in-memory data immediately
-        t2 = time.time()
-        updated_aspects_json = json.dumps(current_aspects)
-        self.unique_df.at[idx, "aspects_sentiments"] = updated_aspects_json
-        
-        # Update the main dataframe as well
-        df_mask = self.df["item_unique_id"] == product_id
-        if df_mask.any():
-            self.df.loc[df_mask, "aspects_sentiments"] = updated_aspects_json
-        
-        memory_time = (time.time() - t2) * 1000
-        print(f"⏱️  Memory update took: {memory_time:.0f}ms")
-        
-        # Save EVERYTHING in background thread (NOTHING blocks the response)
-        def save_all_background():
-            bg_start = time.time()
-            # Save to cache file
-            try:
-                self._save_data_cache(self.df)
-                cache_time = (time.time() - bg_start) * 1000
-                print(f"✅ Feedback persisted to cache for product: {product_id} ({cache_time:.0f}ms)")
-            except Exception as e:
-                print(f"⚠️ Failed to save cache after feedback: {e}")
+        with self.feedback_lock:
+            current_aspects = self.aspects.get(pos)
+            old_codes, old_sentiments, _ = self.aspects.segment(pos)
             
-            # Save to CSV file
-            csv_start = time.time()
-            try:
-                # Ensure item_unique_id exists in df_original
-                if "item_unique_id" not in self.df_original.columns:
-                    for col in ["description", "feature"]:
-                        if col not in self.df_original.columns: 
-                            self.df_original[col] = ""
-                        else: 
-                            self.df_original[col] = self.df_original[col].fillna("")
-                    
-                    self.df_original["item_unique_id"] = (
-                        self.df_original["itemName"].astype(str) + 
-                        self.df_original["category"].astype(str) + 
-                        self.df_original["description"] + 
-                        self.df_original["feature"]
-                    )
+            # Merge new aspects (simple overwrite/update for now)
+            for k, v in new_aspects.items(): 
+                current_aspects[k] = v
                 
-                # Update the original dataframe
-                csv_mask = self.df_original["item_unique_id"] == product_id
-                if csv_mask.any():
-                    self.df_original.loc[csv_mask, "aspects_sentiments"] = updated_aspects_json
-                    self.df_original.to_csv(self.dataframe_path, index=False)
-                    csv_time = (time.time() - csv_start) * 1000
-                    print(f"✅ Feedback persisted to CSV for product: {product_id} ({csv_time:.0f}ms)")
-            except Exception as e:
-                print(f"⚠️ Failed to save CSV after feedback: {e}")
+            updated_aspects_json = json.dumps(current_aspects)
+            self.aspects.update(pos, current_aspects)
+            new_codes, new_sentiments, _ = self.aspects.segment(pos)
+            # Every update orphans the product's previous segment; reclaim them
+            # here, on the request thread that owns the lock, once they
+            # outnumber the live entries (amortized O(1) per update)
+            if self.aspects.orphaned() > self.aspects.size // 2:
+                self.aspects.compact()
+            self.analytics.apply_update(
+                self.products.category_codes[pos],
+                (old_codes, old_sentiments),
+                (new_codes, new_sentiments)
+            )
+            self.products.set_value(pos, "aspects_sentiments", updated_aspects_json)
+            enriched_text = product_text(self.products.row(pos)) + " " + aspect_text(current_aspects)
+            self.products.set_value(pos, "enriched_text", enriched_text)
+            
+            # Update the main dataframe as well
+            review_rows = self.products.review_rows(pos)
+            if len(review_rows):
+                self.df.iloc[review_rows, self.df.columns.get_loc("aspects_sentiments")] = updated_aspects_json
+
+            # Queued last and under the lock, so log order matches apply order
+            # and compaction never sees a record before self.df has it. Blocks
+            # (throttling feedback) if the writer falls behind.
+            self.feedback_writer.submit(product_id, new_aspects)
         
-        # Start background thread for ALL saves (completely non-blocking)
-        save_thread = threading.Thread(target=save_all_background, daemon=True)
-        save_thread.start()
+        memory_time = timer.lap("apply") * 1000
+        print(f"⏱️  Memory update took: {memory_time:.0f}ms")
+
+        # Retrieval reflects the feedback from the next query on
+        self._update_product_vector(pos, enriched_text)
+        print(f"⏱️  Vector update took: {timer.lap('reembed') * 1000:.0f}ms")
         
         # Format analysis for frontend
         analysis_formatted = {}
         for k, v in new_aspects.items():
             analysis_formatted[k] = {"sentiment": v["sentiment"], "confidence": round(v["confidence"], 2)}
 
-        total_time = (time.time() - start_time) * 1000
+        total_time = timer.total() * 1000
+        self.metrics.observe("recommender_operation_seconds", timer.total(), operation="add_feedback", cache="none")
         print(f"🚀 Total feedback response time: {total_time:.0f}ms (ABSA: {absa_time:.0f}ms, Memory: {memory_time:.0f}ms)")
         
         # Return IMMEDIATELY - no waiting for any file I/O
@@ -640,6 +1511,7 @@ class ProductRecommender:
 
     def analyze_text_only(self, text):
         """Analyzes text and returns aspect sentiment without saving."""
+        self._require_absa()
         aspects = self._extract_multi_aspects_single(text)
         analysis_formatted = {}
         for k, v in aspects.items():
@@ -683,9 +1555,9 @@ class ProductRecommender:
         explanations = []
         positive_aspects = {a for a, v in user_aspects.items() if v["polarity"] == "positive"}
         for rec in recommendations:
-            row = self.unique_df[self.unique_df["item_unique_id"] == rec["id"]].iloc[0]
-            try: aspects = json.loads(row["aspects_sentiments"])
-            except: aspects = {}
+            pos = self.products.position(rec["id"])
+            if pos is None: continue
+            aspects = self.aspects.get(pos)
             matched = [a for a in positive_aspects if a in aspects and aspects[a]["sentiment"] == "Positive"]
             top_product = [a for a, v in aspects.items() if v["sentiment"] == "Positive"]
             explanations.append({
@@ -696,70 +1568,56 @@ class ProductRecommender:
         return explanations
 
     def _infer_user_aspects(self, user_query):
-        aspects = self._extract_aspects_batch([user_query])[0]
-        results = []
-        for aspect in aspects:
-            text = f"[CLS] {user_query} [SEP] {aspect} [SEP]"
-            out = self.absa_pipe(text)[0]
-            if out["score"] > 0.6: results.append((aspect, out["label"].capitalize(), out["score"]))
-        return results
+        key = normalize_query(user_query)
+        aspects = self.query_aspect_cache.get(key)
+        if aspects is None:
+            aspects = self._run_query_absa(str(user_query))
+            self.query_aspect_cache.put(key, aspects)
+        return list(aspects)
+
+    def _infer_user_aspects_many(self, queries):
+        """``_infer_user_aspects`` for many queries: one spaCy pass, one ABSA call for the uncached ones."""
+        keys = [normalize_query(q) for q in queries]
+        found, missing = {}, {}
+        for key, query in zip(keys, queries):
+            if key in found or key in missing:
+                continue
+            aspects = self.query_aspect_cache.get(key)
+            if aspects is None:
+                missing[key] = str(query)  # first spelling seen is the one analysed
+            else:
+                found[key] = aspects
+        if missing:
+            texts = list(missing.values())
+            candidates = self._extract_aspects_batch(texts)
+            pairs = [(text, aspect) for text, aspects in zip(texts, candidates) for aspect in aspects]
+            outputs = iter(self._classify(pairs) if pairs else [])
+            for key, aspects in zip(missing, candidates):
+                scored = [(aspect, next(outputs)) for aspect in aspects]
+                found[key] = tuple((aspect, out["label"].capitalize(), out["score"]) for aspect, out in scored if out["score"] > 0.6)
+                self.query_aspect_cache.put(key, found[key])
+        return [list(found[key]) for key in keys]
+
+    def _run_query_absa(self, query):
+        aspects = self._extract_aspects_batch([query])[0]
+        if not aspects: return ()
+        # All noun chunks of the query go into one batched ABSA call
+        outputs = self._classify([(query, aspect) for aspect in aspects])
+        return tuple(
+            (aspect, out["label"].capitalize(), out["score"])
+            for aspect, out in zip(aspects, outputs) if out["score"] > 0.6
+        )
     
     def get_analytics(self):
         """Generate analytics data for dashboard"""
-        # Analyze all products for insights
-        all_aspects = {}
-        sentiment_distribution = {"Positive": 0, "Negative": 0, "Neutral": 0}
-        category_stats = {}
-        
-        for idx, row in self.unique_df.iterrows():
-            try:
-                aspects = json.loads(row["aspects_sentiments"])
-            except:
-                aspects = {}
-            
-            # Count aspects
-            for aspect, data in aspects.items():
-                if aspect not in all_aspects:
-                    all_aspects[aspect] = {"positive": 0, "negative": 0, "neutral": 0, "total": 0}
-                
-                sentiment = data.get("sentiment", "Neutral")
-                all_aspects[aspect][sentiment.lower()] += 1
-                all_aspects[aspect]["total"] += 1
-                sentiment_distribution[sentiment] += 1
-            
-            # Category stats
-            category = str(row.get("category", "Unknown"))
-            if category not in category_stats:
-                category_stats[category] = {"count": 0, "positive": 0, "negative": 0}
-            category_stats[category]["count"] += 1
-            
-            # Count positive/negative aspects per category
-            for aspect, data in aspects.items():
-                if data.get("sentiment") == "Positive":
-                    category_stats[category]["positive"] += 1
-                elif data.get("sentiment") == "Negative":
-                    category_stats[category]["negative"] += 1
-        
-        # Top aspects by frequency
-        top_aspects = sorted(
-            [{"name": k, **v} for k, v in all_aspects.items()],
-            key=lambda x: x["total"],
-            reverse=True
-        )[:15]
-        
-        # Top categories
-        top_categories = sorted(
-            [{"name": k, **v} for k, v in category_stats.items()],
-            key=lambda x: x["count"],
-            reverse=True
-        )[:10]
-        
+        # Aggregates are maintained by add_feedback; this only reads the top-k
+        snapshot = self.analytics.snapshot(top_aspects=15, top_categories=10)
         return self._sanitize_for_json({
             "total_products": len(self.unique_df),
-            "total_aspects": len(all_aspects),
-            "sentiment_distribution": sentiment_distribution,
-            "top_aspects": top_aspects,
-            "top_categories": top_categories,
+            "total_aspects": snapshot["total_aspects"],
+            "sentiment_distribution": snapshot["sentiment_distribution"],
+            "top_aspects": snapshot["top_aspects"],
+            "top_categories": snapshot["top_categories"],
             "dataset_info": {
                 "total_reviews": len(self.df),
                 "unique_products": len(self.unique_df)
@@ -778,15 +1636,12 @@ class ProductRecommender:
         all_aspect_names = set()
         
         for product_id in product_ids:
-            mask = self.unique_df["item_unique_id"] == product_id
-            if not mask.any():
+            pos = self.products.position(product_id)
+            if pos is None:
                 continue
-            
-            row = self.unique_df[mask].iloc[0]
-            try:
-                aspects = json.loads(row["aspects_sentiments"])
-            except:
-                aspects = {}
+
+            row = self.products.row(pos)
+            aspects = self.aspects.get(pos)
             
             # Collect all aspect names
             all_aspect_names.update(aspects.keys())